@@ -0,0 +1,116 @@
+"""
+Replays recorded games through the engine and finds every move that changed the game-theoretic value,
+a won position played into a draw or loss, or a drawn one into a loss.
+
+    python analyze_records.py                           the game's own record file
+    python analyze_records.py records.bin --show 20     also list the first 20 such moves
+
+Needs a board small enough to solve, 3x3. Records are streamed, so files of any size work.
+"""
+
+import argparse
+import os
+import sys
+import time
+from constants import *
+from engine import AI, base_dir, new_board
+from game_records import UNFINISHED, read_records
+
+
+def position_value(board, player_to_move):
+
+    # 1 win, 0 draw, -1 loss for the player to move with best play from both sides
+    solved_table = AI.get_solved_table()
+    entry = solved_table.lookup(board.position()) if solved_table else None
+
+    if entry is not None:
+        return entry[0]
+
+    return AI(board, 'minimax', player_to_move).minimax(board)[0]
+
+
+def analyze(record):
+
+    """
+    :return: (move number, player, (row, col), value before, value after) of every move that changed the value,
+             both values for the player who moved
+    """
+
+    board = new_board()
+    player = 1
+    value = position_value(board, player)
+    changes = []
+
+    for number, (row, col) in enumerate(record.moves, 1):
+
+        board.mark_move(row, col, player)
+
+        # the opponent is to move now, so their value is the mover's turned around
+        value_after = -position_value(board, 3 - player)
+
+        if value_after != value:
+            changes.append((number, player, (row, col), value, value_after))
+
+        value = -value_after
+        player = 3 - player
+
+    return changes
+
+
+def mover(record, player):
+
+    if record.game_mode == 'pvp':
+        return f'player {player}'
+
+    return f'AI ({record.ai_mode})' if player == record.ai_player else 'human'
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Find the moves in recorded games that changed the result.')
+    parser.add_argument('path', nargs='?', default=os.path.join(base_dir, RECORDS_FILE))
+    parser.add_argument('--show', type=int, default=0, help='list this many of the moves found')
+    args = parser.parse_args()
+
+    if ROWS * COLS > 9:
+        sys.exit(f'Only a 3x3 board can be solved to find game-theoretic values, the board is {ROWS}x{COLS}')
+
+    start = time.perf_counter()
+
+    games = 0
+    moves = 0
+    results = {0: 0, 1: 0, 2: 0, UNFINISHED: 0}
+    changes_by_mover = {}
+    shown = 0
+
+    try:
+        for record in read_records(args.path):
+
+            games += 1
+            moves += len(record.moves)
+            results[record.result] = results.get(record.result, 0) + 1
+
+            for number, player, square, value, value_after in analyze(record):
+
+                name = mover(record, player)
+                changes_by_mover[name] = changes_by_mover.get(name, 0) + 1
+
+                if shown < args.show:
+                    print(f'game {games} move {number}: {name} played {square}, '
+                          f'{value:+d} -> {value_after:+d}')
+                    shown += 1
+
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+
+    elapsed = time.perf_counter() - start
+
+    print(f'{games} games, {moves} moves in {elapsed:.2f}s ({games / max(elapsed, 1e-9):,.0f} games/s)')
+    print(f'X won {results[1]}, O won {results[2]}, draws {results[0]}, unfinished {results[UNFINISHED]}')
+
+    for name, count in sorted(changes_by_mover.items()):
+        print(f'{name:>20}: {count} moves changed the value')
+
+
+if __name__ == '__main__':
+    main()
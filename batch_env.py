@@ -0,0 +1,158 @@
+import sys
+import time
+import numpy as np
+from constants import *
+from engine import WIN_MASKS, WIN_LINES, new_board
+
+# Many boards stepped at once with NumPy, for training and simulation. Needs numpy from requirements-tools.txt, the game itself doesn't.
+
+LINE_INDICES = np.array(WIN_LINES, dtype=np.intp)  # (lines, ROWS) flat square indices, in Board.state order
+
+
+class BatchBoard:
+
+    def __init__(self, size):
+
+        self.size = size
+        self.boards = np.zeros((size, ROWS, COLS), dtype=np.int8)
+        self.marked_squares = np.zeros(size, dtype=np.int16)
+        self.cur_player = np.ones(size, dtype=np.int8)  # player 1 always starts
+
+    def reset(self, indices=None):
+
+        if indices is None:
+            indices = slice(None)
+
+        self.boards[indices] = 0
+        self.marked_squares[indices] = 0
+        self.cur_player[indices] = 1
+
+    def mark_move(self, indices, rows, cols, players):
+
+        self.boards[indices, rows, cols] = players
+        self.marked_squares[indices] += 1
+
+    def state(self, return_positions=False):
+
+        """
+        :return: (size,) array of 0 if no winner yet, else the winning player
+        :return: with return_positions, also the index into WIN_MASKS of the winning line, -1 if none
+        """
+
+        lines = self.boards.reshape(self.size, -1)[:, LINE_INDICES]  # (size, lines, ROWS)
+        first = lines[:, :, 0]
+
+        won = (first != 0) & (lines == first[:, :, None]).all(axis=2)
+        has_winner = won.any(axis=1)
+
+        # the first complete line in Board.state order decides, as in the scalar version
+        line_index = np.where(has_winner, won.argmax(axis=1), -1)
+        winner = np.where(has_winner, first[np.arange(self.size), line_index], 0).astype(np.int8)
+
+        if return_positions:
+            return winner, line_index
+
+        return winner
+
+    def isfull(self):
+        return self.marked_squares == ROWS * COLS
+
+    def running(self):
+        return (self.state() == 0) & ~self.isfull()
+
+    def empty_squares(self):
+        return self.boards.reshape(self.size, -1) == 0  # (size, ROWS * COLS) mask
+
+    def random_step(self, rng):
+
+        """
+        Plays a uniformly random empty square, like the 'random' ai mode, on every unfinished board.
+        :return: (indices, rows, cols) of the boards that moved and the squares played
+        """
+
+        indices = np.flatnonzero(self.running())
+
+        # argmax of random keys over the empty squares picks each empty square with equal chance
+        keys = rng.random((len(indices), ROWS * COLS))
+        keys[~self.empty_squares()[indices]] = -1
+
+        squares = keys.argmax(axis=1)
+        rows, cols = np.divmod(squares, COLS)
+
+        self.mark_move(indices, rows, cols, self.cur_player[indices])
+        self.cur_player[indices] = 3 - self.cur_player[indices]
+
+        return indices, rows, cols
+
+
+def play_random_games(size, seed=0):
+
+    # every board played to the end, with the moves kept for replaying on the scalar Board
+    rng = np.random.default_rng(seed)
+    batch = BatchBoard(size)
+
+    moves = np.full((size, ROWS * COLS), -1, dtype=np.int16)
+    turns = 0
+
+    while True:
+
+        indices, rows, cols = batch.random_step(rng)
+
+        if len(indices) == 0:
+            return batch, moves
+
+        moves[indices, turns] = rows * COLS + cols
+        turns += 1
+
+
+def verify(batch, moves, count):
+
+    # replays the first count boards on the scalar Board and compares every result
+    winners, line_indices = batch.state(return_positions=True)
+    full = batch.isfull()
+
+    for index in range(count):
+
+        board = new_board()
+        player = 1
+
+        for square in moves[index]:
+            if square < 0:
+                break
+
+            board.mark_move(*divmod(int(square), COLS), player)
+            player = 3 - player
+
+        assert board.position() == tuple(batch.boards[index].ravel().tolist()), f'board {index} differs'
+        assert board.isfull() == full[index], f'board {index} full check differs'
+
+        state = board.state(return_positions=True)
+
+        if state == 0:
+            assert winners[index] == 0 and line_indices[index] == -1, f'board {index} winner differs'
+
+        else:
+            win_mask, orientation, first_element, last_element = WIN_MASKS[line_indices[index]]
+            assert state == (winners[index], orientation, first_element, last_element), f'board {index} winner differs'
+
+
+def main(size):
+
+    start = time.perf_counter()
+    batch, moves = play_random_games(size)
+    elapsed = time.perf_counter() - start
+
+    print(f'{size} random games in {elapsed:.3f}s, {size / elapsed:,.0f} games/s, '
+          f'{int(batch.marked_squares.sum()) / elapsed:,.0f} board steps/s')
+
+    counts = np.bincount(batch.state(), minlength=3)
+    print(f'player 1 won {counts[1]}, player 2 won {counts[2]}, draws {counts[0]}')
+
+    sample = min(size, 20000)
+    start = time.perf_counter()
+    verify(batch, moves, sample)
+    print(f'{sample} boards match the scalar Board ({time.perf_counter() - start:.2f}s)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
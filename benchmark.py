@@ -0,0 +1,208 @@
+"""
+Times the engine on a fixed set of positions and compares the numbers with a saved baseline.
+
+    python benchmark.py                      run, save benchmark.json, compare with benchmark_baseline.json
+    python benchmark.py --update-baseline    run and make the results the new baseline
+
+Exits with status 1 when anything is slower than the baseline by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+import constants
+
+# positions as the squares played so far (row-major index), the AI is always the player to move
+CORPUS = {
+    3: [
+        ('empty, ai first', []),
+        ('opening, ai second', [0]),
+        ('midgame', [4, 0, 8]),
+        ('near terminal', [0, 4, 8, 2, 6]),
+    ],
+    4: [
+        ('empty, ai first', []),
+        ('opening, ai second', [5]),
+        ('midgame', [5, 0, 10, 15, 6, 9]),
+        ('near terminal', [5, 0, 10, 15, 6, 9, 4, 7, 1, 13]),
+    ],
+    5: [
+        ('empty, ai first', []),
+        ('opening, ai second', [12]),
+        ('midgame', [12, 0, 6, 18, 8, 16]),
+        ('near terminal', [12, 0, 6, 18, 8, 16, 7, 17, 2, 22, 11, 13]),
+    ],
+}
+
+SEARCH_ENGINES = {
+    3: ['minimax:search', 'minimax', 'alphabeta:9'],
+    4: ['alphabeta:4', 'iterative:200', 'mcts:2000'],
+    5: ['alphabeta:3', 'iterative:200', 'mcts:2000'],
+}
+
+LOWER_IS_BETTER = ('time to move ms', 'ns per call')
+HIGHER_IS_BETTER = ('depth reached',)
+
+
+def build_board(make_board, moves):
+
+    board = make_board()
+    player = 1
+
+    for square in moves:
+        board.mark_move(*divmod(square, constants.COLS), player)
+        player = 3 - player
+
+    return board, player
+
+
+def benchmark_size(rows, repeats):
+
+    # the engine reads the board size when it is imported, so each size runs in its own process
+    constants.ROWS, constants.COLS = rows, rows
+
+    import engine
+    from tournament import make_ai
+
+    results = {}
+
+    for spec in SEARCH_ENGINES[rows]:
+        for label, moves in CORPUS[rows]:
+
+            runs = []  # (seconds, nodes, depth reached), an iterative search reaches a different depth each time
+            for _ in range(repeats):
+
+                engine.AI.transposition_table.clear()  # every search starts cold
+                board, player = build_board(engine.new_board, moves)
+                ai = make_ai(spec, board, player)
+
+                start = time.perf_counter()
+                ai.ai_move()
+                runs.append((time.perf_counter() - start, ai.nodes, ai.depth_reached))
+
+            engine.AI.transposition_table.clear()
+            board, player = build_board(engine.new_board, moves)
+            ai = make_ai(spec, board, player)
+
+            tracemalloc.start()
+            ai.ai_move()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            best_time, nodes, depth_reached = min(runs)
+            result = {
+                'nodes': nodes,
+                'nodes per sec': nodes / best_time if best_time else 0,
+                'peak memory kb': peak_memory / 1024,
+            }
+
+            # an iterative search always takes its budget, how deep it got is what changes
+            if ai.mode == 'iterative':
+                result['depth reached'] = depth_reached
+            else:
+                result['time to move ms'] = best_time * 1000
+
+            results[f'{rows}x{rows} {spec} | {label}'] = result
+
+    for board_class in (engine.Board, engine.BitBoard):
+        for label, moves in CORPUS[rows]:
+
+            board, player = build_board(board_class, moves)
+
+            for method in ('state', 'get_empty_squares'):
+
+                timer = timeit.Timer(getattr(board, method))
+                best = min(timer.repeat(repeat=repeats, number=1000)) / 1000
+
+                results[f'{rows}x{rows} {board_class.__name__}.{method} | {label}'] = {'ns per call': best * 1e9}
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+
+    regressions = []
+
+    for name, metrics in results.items():
+        for metric in LOWER_IS_BETTER:
+
+            if metric not in metrics or metric not in baseline.get(name, {}):
+                continue
+
+            old = baseline[name][metric]
+            new = metrics[metric]
+
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {old:.4g} -> {new:.4g} ({new / old - 1:+.0%})')
+
+        for metric in HIGHER_IS_BETTER:
+
+            if metric in metrics and metrics[metric] < baseline.get(name, {}).get(metric, 0):
+                regressions.append(f'{name}: {metric} {baseline[name][metric]} -> {metrics[metric]}')
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark search and board operations.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=sorted(CORPUS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 is 25%%')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(benchmark_size(args.child, args.repeats)))
+        return 0
+
+    results = {}
+
+    for rows in args.sizes:
+
+        if rows not in CORPUS:
+            parser.error(f'No positions for a {rows}x{rows} board, choose from {sorted(CORPUS)}')
+
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(rows),
+                                '--repeats', str(args.repeats)], capture_output=True, text=True, check=True)
+        results.update(json.loads(child.stdout))
+
+    for name, metrics in results.items():
+        print(f'{name:<60} ' + '  '.join(f'{metric} {value:,.3f}' for metric, value in metrics.items()))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --update-baseline to create one')
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+
+    if regressions:
+        print(f'\n{len(regressions)} slower than {args.baseline}:')
+        print('\n'.join(regressions))
+        return 1
+
+    print(f'\nNothing slower than {args.baseline} by more than {args.tolerance:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
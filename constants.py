@@ -1,25 +1,96 @@
-FACTOR = 1
-WIDTH, HEIGHT = round(540 * FACTOR), round(540 * FACTOR)
+from collections import namedtuple
+
+FACTOR = 1  # window scale at start, resizing the window changes it while the game runs
+MIN_FACTOR = 0.5  # smallest window scale, 270 x 270
+SCALE_STEP = 0.05  # window scales snap to steps of 27 pixels, so dragging an edge passes through few of them
+SCALE_CACHE_SIZE = 4  # scales whose board figures are kept drawn, the least recently used is dropped first
 ROWS, COLS = 3,3
 assert ROWS == COLS, "Rows and Cols should be equal"
-TILE_SIZE = round(WIDTH / COLS)
+
+ScaledSizes = namedtuple('ScaledSizes', ['FACTOR', 'WIDTH', 'HEIGHT', 'TILE_SIZE', 'LINE_WIDTH', 'CIRCLE_WIDTH',
+                                         'CIRCLE_RADIUS', 'CROSS_WIDTH', 'CROSS_LENGTH', 'WIN_WIDTH', 'OFFSET',
+                                         'BUTTON_SIZE', 'BUTTON_BORDER_WIDTH', 'BUTTON_FONT_SIZE', 'HEADER_FONT_SIZE',
+                                         'NORMAL_FONT_SIZE', 'HUD_FONT_SIZE'])
+
+
+def scaled_sizes(factor):
+
+    # every size in pixels for a window scale, main.py's set_scale assigns them again when the window is resized
+    width, height = round(540 * factor), round(540 * factor)
+
+    return ScaledSizes(
+        FACTOR=factor,
+        WIDTH=width,
+        HEIGHT=height,
+        TILE_SIZE=round(width / COLS),
+
+        LINE_WIDTH=round(15 * factor),
+        CIRCLE_WIDTH=round(15 * factor),
+        CIRCLE_RADIUS=round(45 * factor),
+        CROSS_WIDTH=round(15 * factor),
+        CROSS_LENGTH=round(99 * factor),
+        WIN_WIDTH=round(15 * factor),
+        OFFSET=round(70 * factor),
+
+        BUTTON_SIZE=(round(250 * factor), round(60 * factor)),
+        BUTTON_BORDER_WIDTH=round(10 * factor),
+
+        BUTTON_FONT_SIZE=round(35 * factor),
+        HEADER_FONT_SIZE=round(65 * factor),
+        NORMAL_FONT_SIZE=round(25 * factor),
+        HUD_FONT_SIZE=round(16 * factor),
+    )
+
+
+_sizes = scaled_sizes(FACTOR)
+
+WIDTH, HEIGHT = _sizes.WIDTH, _sizes.HEIGHT
+TILE_SIZE = _sizes.TILE_SIZE
 
 FPS = 60
+IDLE_FPS = 10  # frame cap while nothing moves and there is no input
+IDLE_DELAY = 0.5  # seconds of full frame rate after the last input
+SHOW_IDLE_STATS = False  # print CPU time per idle minute on quit
+PROFILING = False  # time frames, AI moves and drawing from the start, F3 turns it on later and shows the numbers
+PROFILE_DIR = 'Profiles'  # a Chrome trace of each profiled session is saved here on quit
+PROFILE_MAX_EVENTS = 200000  # trace events kept, the oldest are dropped first
+RECORD_GAMES = True  # append every game to RECORDS_FILE
+THINKING_INDICATOR_DELAY = 0.15  # seconds the AI can think before the window shows it
+SURFACE_CACHE_SIZE = 256  # fonts, text and button surfaces kept ready to blit, for a few window scales
+END_FADE_FRAMES = 60  # frames the finished board takes to fade behind the end screen
+END_SCREEN_DELAY = 2  # seconds the finished board stays up before the end screen
+
+LINE_WIDTH = _sizes.LINE_WIDTH
+CIRCLE_WIDTH = _sizes.CIRCLE_WIDTH
+CIRCLE_RADIUS = _sizes.CIRCLE_RADIUS
+CROSS_WIDTH = _sizes.CROSS_WIDTH
+CROSS_LENGTH = _sizes.CROSS_LENGTH
+WIN_WIDTH = _sizes.WIN_WIDTH
+OFFSET = _sizes.OFFSET
 
-LINE_WIDTH = round(15 * FACTOR)
-CIRCLE_WIDTH = round(15 * FACTOR)
-CIRCLE_RADIUS = round(45 * FACTOR)
-CROSS_WIDTH = round(15 * FACTOR)
-CROSS_LENGTH = round(99 * FACTOR)
-WIN_WIDTH = round(15 * FACTOR)
-OFFSET = round(70 * FACTOR)
+BOARD_BACKEND = 'bitboard'  # Options : 'bitboard' or 'list'
+TRANSPOSITION_TABLE_SIZE = 50000
+
+AI_DEPTH_LIMIT = {3: 9, 4: 6, 5: 5}.get(ROWS, 4)  # plies searched by the 'alphabeta' ai mode, about 1 second per move at most
+AI_TIME_BUDGET = 1000  # milliseconds per move for the 'iterative' and 'mcts' ai modes
+MCTS_ITERATIONS = None  # rollouts per 'mcts' move, None searches for AI_TIME_BUDGET instead
+MCTS_WORKERS = None  # processes sharing the 'mcts' rollouts, None uses every core
+MCTS_EXPLORATION = 1.4  # UCT exploration constant
+HARD_AI_MODE = 'minimax' if ROWS == 3 else 'iterative'  # exhaustive minimax only finishes on 3x3
+MEDIUM_MISTAKE_CHANCE = 0.15  # how often the 'medium' ai mode plays a next best move instead of the best
+HINT_TIME_BUDGET = 250  # milliseconds a hint may search on boards larger than 3x3
+
+SERVER_HOST = '127.0.0.1'  # server.py only listens locally
+SERVER_PORT = 5151
+SERVER_WORKERS = None  # processes running the server's AI searches, None uses every core
 
 BG_COLOR = (28, 170, 156)
 LINE_COLOR = (23, 145, 135)
 CIRCLE_COLOR = (239, 231, 200)
 CROSS_COLOR = (66, 66, 66)
+HINT_ALPHA = 90  # opacity of the marks showing a hint
 
-BUTTON_SIZE = (round(250 * FACTOR), round(60 * FACTOR))
+BUTTON_SIZE = _sizes.BUTTON_SIZE
 BUTTON_COLOR = (16, 101, 94)
 BUTTON_RADIUS = 5
 BUTTON_BORDER = False
@@ -27,18 +98,22 @@ BUTTON_HOVER = True
 
 BUTTON_FONT_NAME = 'consolas'
 BUTTON_FONT_COLOR = (250, 248, 239)
-BUTTON_FONT_SIZE = round(35 * FACTOR)
+BUTTON_FONT_SIZE = _sizes.BUTTON_FONT_SIZE
 
 HEADER_FONT_NAME = 'cambria'
 HEADER_FONT_COLOR = (66, 66, 66)
-HEADER_FONT_SIZE = round(65 * FACTOR)
+HEADER_FONT_SIZE = _sizes.HEADER_FONT_SIZE
 
 NORMAL_FONT_NAME = 'consolas'
 NORMAL_FONT_COLOR = (66, 66, 66)
-NORMAL_FONT_SIZE = round(25 * FACTOR)
+NORMAL_FONT_SIZE = _sizes.NORMAL_FONT_SIZE
+
+HUD_TEXT_COLOR = (250, 248, 239)
+HUD_BG_COLOR = (0, 0, 0, 170)
+HUD_FONT_SIZE = _sizes.HUD_FONT_SIZE
 
 if BUTTON_BORDER:
-    BUTTON_BORDER_WIDTH = round(10 * FACTOR)
+    BUTTON_BORDER_WIDTH = _sizes.BUTTON_BORDER_WIDTH
     BUTTON_BORDER_COLOR = (66, 66, 66)
 
 if BUTTON_HOVER:
@@ -49,7 +124,10 @@ SHARP_EDGE_CROSS = False
 SHARP_EDGE_WIN = False
 
 
-DATA_FILE = 'Game Variables.dat'
+DATA_FILE = 'Game Variables.json'
 CLICK_SOUND_FILE = 'Assets/Click Sound.wav'
 WIN_SOUND_FILE = 'Assets/Win Sound.mp3'
-ICON_FILE = 'Assets/Game Icon.png'
\ No newline at end of file
+ICON_FILE = 'Assets/Game Icon.png'
+SOLVED_TABLE_FILE = 'Assets/Solved Positions.bin'
+RECORDS_FILE = 'Game Records.bin'
+
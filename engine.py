@@ -0,0 +1,1157 @@
+import os
+import copy
+import mmap
+import struct
+import math as mp
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from constants import *
+from profiling import profiler
+
+# Game rules and AI, kept free of pygame so they can run without a display
+
+base_dir = os.path.dirname(__file__)
+
+
+def get_symmetries():
+
+    # every rotation / reflection of the square board as (permutation, inverse) of flat indices
+    transforms = [
+        lambda row, col: (row, col),
+        lambda row, col: (col, ROWS - 1 - row),
+        lambda row, col: (ROWS - 1 - row, COLS - 1 - col),
+        lambda row, col: (COLS - 1 - col, row),
+        lambda row, col: (row, COLS - 1 - col),
+        lambda row, col: (ROWS - 1 - row, col),
+        lambda row, col: (col, row),
+        lambda row, col: (COLS - 1 - col, ROWS - 1 - row),
+    ]
+
+    symmetries = []
+
+    for transform in transforms:
+
+        permutation = []
+        for row in range(ROWS):
+            for col in range(COLS):
+                source_row, source_col = transform(row, col)
+                permutation.append(source_row * COLS + source_col)
+
+        inverse = [0] * len(permutation)
+        for index, source in enumerate(permutation):
+            inverse[source] = index
+
+        symmetries.append((tuple(permutation), tuple(inverse)))
+
+    return symmetries
+
+
+SYMMETRIES = get_symmetries()
+
+
+def get_win_masks():
+
+    # same order as Board.state: rows, columns, down diagonal, up diagonal
+    lines = []
+
+    for row in range(ROWS):
+        squares = [(row, col) for col in range(COLS)]
+        lines.append((squares, 'horizontal', (row, 0), (row, COLS - 1)))
+
+    for col in range(COLS):
+        squares = [(row, col) for row in range(ROWS)]
+        lines.append((squares, 'vertical', (0, col), (ROWS - 1, col)))
+
+    squares = [(i, i) for i in range(ROWS)]
+    lines.append((squares, 'down diagonal', (0, 0), (ROWS - 1, COLS - 1)))
+
+    squares = [(i, COLS - i - 1) for i in range(ROWS)]
+    lines.append((squares, 'up diagonal', (ROWS - 1, 0), (0, COLS - 1)))
+
+    win_masks = []
+
+    for squares, orientation, first_element, last_element in lines:
+
+        mask = 0
+        for row, col in squares:
+            mask |= 1 << (row * COLS + col)
+
+        win_masks.append((mask, orientation, first_element, last_element))
+
+    return win_masks
+
+
+WIN_MASKS = get_win_masks()
+
+# win masks passing through each square, so a move only checks its own lines
+SQUARE_WIN_MASKS = [[win for win in WIN_MASKS if win[0] >> index & 1] for index in range(ROWS * COLS)]
+
+FULL_MASK = (1 << (ROWS * COLS)) - 1
+
+# square indices of every win line and each square's distance from the centre, for search heuristics
+WIN_LINES = [[index for index in range(ROWS * COLS) if win[0] >> index & 1] for win in WIN_MASKS]
+CENTER_DISTANCE = [abs(row - (ROWS - 1) / 2) + abs(col - (COLS - 1) / 2) for row in range(ROWS) for col in range(COLS)]
+
+WIN_SCORE = 1000000000
+
+
+class TranspositionTable:
+
+    def __init__(self, max_size):
+
+        self.max_size = max_size
+        self.entries = OrderedDict()  # least recently used entry first
+
+    def get(self, key):
+
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def store(self, key, entry):
+
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SolvedTable:
+    # best move and value of every position, read straight from a memory mapped file
+
+    HEADER = struct.Struct('<4sBBBx')  # magic, version, rows, cols
+    MAGIC = b'TTTS'
+    VERSION = 1
+    NO_ENTRY = 0xFF  # position not reachable in a legal game
+    NO_MOVE = 0x0F  # position is already over
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as f:
+            self.table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, rows, cols = self.HEADER.unpack_from(self.table)
+
+        if magic != self.MAGIC or version != self.VERSION or (rows, cols) != (ROWS, COLS):
+            self.table.close()
+            raise ValueError(f'{path} is not a solved table for a {ROWS}x{COLS} board')
+
+    @staticmethod
+    def position_index(position):
+
+        index = 0
+        for square in position:
+            index = index * 3 + square
+
+        return index
+
+    @classmethod
+    def encode(cls, value, move):  # value is from the point of view of the player to move
+
+        if move is None:
+            return (value + 1) << 4 | cls.NO_MOVE
+
+        row, col = move
+        return (value + 1) << 4 | (row * COLS + col)
+
+    def lookup(self, position):
+
+        """
+        :return: None if the position is not in the table
+        :return: (value, move) for the player to move, move is None if the game is over
+        """
+
+        entry = self.table[self.HEADER.size + self.position_index(position)]
+
+        if entry == self.NO_ENTRY:
+            return None
+
+        value = (entry >> 4) - 1
+        move = entry & 0x0F
+
+        if move == self.NO_MOVE:
+            return (value, None)
+
+        return (value, divmod(move, COLS))
+
+
+class AI:
+    # shared by every AI in the process, so results survive across moves and restarts
+    transposition_table = TranspositionTable(TRANSPOSITION_TABLE_SIZE)
+    solved_table = None  # loaded on first use, False if no table exists for this board size
+    mcts_pool = None  # worker processes for 'mcts' rollouts, started on first use
+    mcts_pool_size = 0
+
+    def __init__(self, board, ai_mode, ai_player):  # 'random', 'medium', 'minimax', 'alphabeta', 'iterative' or 'mcts'
+
+        self.board = board
+        self.mode = ai_mode
+        self.ai_player = ai_player
+        self.opponent_player = self.get_other_player()
+
+        self.depth_limit = AI_DEPTH_LIMIT
+        self.time_budget = AI_TIME_BUDGET  # milliseconds, for 'iterative' and 'mcts'
+        self.mcts_iterations = MCTS_ITERATIONS  # used instead of the time budget when set
+        self.mcts_workers = MCTS_WORKERS or os.cpu_count() or 1
+        self.mcts_root = None  # tree kept from the last 'mcts' move
+        self.mcts_position = None  # position at the kept tree's root
+        self.use_solved_table = True  # 'minimax' answers from the solved table when one exists
+        self.nodes = 0  # positions visited by the last ai_move
+        self.depth_reached = 0  # deepest iteration the last 'iterative' ai_move completed
+        self.rollouts_per_sec = 0  # over every worker during the last 'mcts' ai_move
+        self.killer_moves = {}  # ply : up to two moves that caused a cutoff at that ply
+        self.history = {}  # move : accumulated cutoff score
+        self.best_moves = {}  # position : best move found by the previous iteration, searched first by the next
+        self.deadline = None  # perf_counter time the running iterative search must stop at
+
+        self.cancelled = threading.Event()  # set from another thread to abandon a running search
+
+    def __getstate__(self):
+
+        # an Event can't be pickled, so an AI sent to another process gets a fresh one
+        state = self.__dict__.copy()
+        del state['cancelled']
+
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self.cancelled = threading.Event()
+
+    @classmethod
+    def get_solved_table(cls):
+
+        if cls.solved_table is None:
+            try:
+                cls.solved_table = SolvedTable(os.path.join(base_dir, SOLVED_TABLE_FILE))
+            except (OSError, ValueError):
+                cls.solved_table = False
+
+        return cls.solved_table
+
+    @classmethod
+    def get_mcts_pool(cls, processes):
+
+        if cls.mcts_pool_size != processes:
+
+            if cls.mcts_pool is not None:
+                cls.mcts_pool.terminate()
+
+            import multiprocessing  # only 'mcts' uses it, so the game's start doesn't pay for the import
+            cls.mcts_pool = multiprocessing.Pool(processes)
+            cls.mcts_pool_size = processes
+
+        return cls.mcts_pool
+
+    def solved_move(self, board):
+
+        solved_table = self.get_solved_table()
+
+        # the table is written for the player whose turn it is, and player 1 always starts
+        player_to_move = 1 if board.marked_squares % 2 == 0 else 2
+
+        if not solved_table or player_to_move != self.ai_player:
+            return None
+
+        entry = solved_table.lookup(board.position())
+
+        if entry is None:
+            return None
+
+        return entry[1]
+
+    def get_other_player(self):
+
+        players = [1, 2]
+        players.remove(self.ai_player)
+        return players[0]
+
+    def canonical_key(self, board, max_or_min):
+
+        position = board.position()
+
+        best_key = None
+        best_symmetry = None
+
+        for permutation, inverse in SYMMETRIES:
+            key = tuple([position[index] for index in permutation])
+
+            if best_key is None or key < best_key:
+                best_key = key
+                best_symmetry = (permutation, inverse)
+
+        return (best_key, self.ai_player, max_or_min), best_symmetry
+
+    def minimax(self, board, max_or_min='max'):  # ai is maximising
+
+        self.nodes += 1
+        key, (permutation, inverse) = self.canonical_key(board, max_or_min)
+        entry = self.transposition_table.get(key)
+
+        if entry is not None:
+            eval, move = entry
+
+            if move is not None:
+                move = divmod(permutation[move], COLS)
+
+            return (eval, move)
+
+        eval, move = self.search(board, max_or_min)
+
+        if move is not None:
+            row, col = move
+            self.transposition_table.store(key, (eval, inverse[row * COLS + col]))
+
+        else:
+            self.transposition_table.store(key, (eval, None))
+
+        return (eval, move)
+
+    def search(self, board, max_or_min):
+
+        if self.cancelled.is_set():
+            raise SearchCancelled()
+
+        case = board.state()
+
+        if case == self.ai_player:
+            return (1, None)
+
+        elif case == self.opponent_player:
+            return (-1, None)
+
+        elif board.isfull() and case == 0:
+            return (0, None)
+
+        if max_or_min == 'min':
+
+            min_eval = 100
+            best_move = None
+            empty_squares = board.get_empty_squares()
+
+            for row, col in empty_squares:
+
+                board.mark_move(row, col, self.opponent_player)
+                eval = self.minimax(board, 'max')[0]
+                board.unmark_move(row, col)
+
+                if eval == -1:
+
+                    min_eval = eval
+                    best_move = (row, col)
+
+                    return (min_eval, best_move)
+
+                elif eval < min_eval:
+
+                    min_eval = eval
+                    best_move = (row, col)
+
+            return (min_eval, best_move)
+
+        elif max_or_min == 'max':
+
+            max_eval = -100
+            best_move = None
+            empty_squares = board.get_empty_squares()
+
+            for row, col in empty_squares:
+
+                board.mark_move(row, col, self.ai_player)
+                eval = self.minimax(board, 'min')[0]
+                board.unmark_move(row, col)
+
+                if eval == 1:
+
+                    max_eval = eval
+                    best_move = (row, col)
+
+                    return (max_eval, best_move)
+
+                elif eval > max_eval:
+
+                    max_eval = eval
+                    best_move = (row, col)
+
+            return (max_eval, best_move)
+
+        raise Exception('The board not found in any case')
+
+    def alphabeta(self, board, depth, alpha=-mp.inf, beta=mp.inf, max_or_min='max', ply=0):  # ai is maximising
+
+        if self.cancelled.is_set():
+            raise SearchCancelled()
+
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        self.nodes += 1
+        case = board.state()
+
+        # quicker wins and slower losses score better
+        if case == self.ai_player:
+            return (WIN_SCORE - ply, None)
+
+        elif case == self.opponent_player:
+            return (-WIN_SCORE + ply, None)
+
+        elif board.isfull():
+            return (0, None)
+
+        if depth == 0:
+            return (self.evaluate(board), None)
+
+        if max_or_min == 'max':
+
+            max_eval = -mp.inf
+            best_move = None
+
+            for row, col in self.order_moves(board, self.ai_player, ply):
+
+                board.mark_move(row, col, self.ai_player)
+                eval = self.alphabeta(board, depth - 1, alpha, beta, 'min', ply + 1)[0]
+                board.unmark_move(row, col)
+
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = (row, col)
+
+                alpha = max(alpha, eval)
+
+                if alpha >= beta:
+                    self.store_cutoff((row, col), depth, ply)
+                    break
+
+            self.store_best_move(board, best_move, depth)
+            return (max_eval, best_move)
+
+        elif max_or_min == 'min':
+
+            min_eval = mp.inf
+            best_move = None
+
+            for row, col in self.order_moves(board, self.opponent_player, ply):
+
+                board.mark_move(row, col, self.opponent_player)
+                eval = self.alphabeta(board, depth - 1, alpha, beta, 'max', ply + 1)[0]
+                board.unmark_move(row, col)
+
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = (row, col)
+
+                beta = min(beta, eval)
+
+                if alpha >= beta:
+                    self.store_cutoff((row, col), depth, ply)
+                    break
+
+            self.store_best_move(board, best_move, depth)
+            return (min_eval, best_move)
+
+        raise Exception('The board not found in any case')
+
+    def order_moves(self, board, player, ply):
+
+        # the previous iteration's best move first, then winning squares, blocks, killer moves,
+        # history score and closeness to the centre
+        position = board.position()
+        best_move = self.best_moves.get(position)
+        threats = {}
+
+        for line in WIN_LINES:
+
+            values = [position[index] for index in line]
+
+            if values.count(0) != 1:
+                continue
+
+            empty_index = line[values.index(0)]
+
+            if values.count(player) == ROWS - 1:
+                threats[empty_index] = 2
+
+            elif values.count(player) == 0:
+                threats[empty_index] = max(threats.get(empty_index, 0), 1)
+
+        killers = self.killer_moves.get(ply, [])
+
+        def priority(move):
+
+            row, col = move
+            index = row * COLS + col
+
+            return (move == best_move, threats.get(index, 0), move in killers, self.history.get(move, 0),
+                    -CENTER_DISTANCE[index])
+
+        return sorted(board.get_empty_squares(), key=priority, reverse=True)
+
+    def store_cutoff(self, move, depth, ply):
+
+        killers = self.killer_moves.setdefault(ply, [])
+
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    def store_best_move(self, board, move, depth):
+
+        # only iterative deepening comes back to the same positions, and leaves are not worth remembering
+        if self.deadline is not None and depth > 1 and move is not None:
+            self.best_moves[board.position()] = move
+
+    @contextmanager
+    def deepening(self, board, time_budget):
+
+        """
+        A search one depth deeper at a time until time_budget milliseconds from now. A SearchTimeout in the
+        with block ends it, the code after the block carries on with the deepest depth that finished.
+        :return: a copy of board to search on, a search stopped by the deadline leaves its moves on the board
+        """
+
+        self.deadline = time.perf_counter() + time_budget / 1000
+        self.killer_moves = {}
+        self.best_moves = {}
+        self.depth_reached = 0
+
+        try:
+            yield copy.deepcopy(board)
+
+        except SearchTimeout:
+            pass
+
+        finally:
+            self.deadline = None
+            self.best_moves = {}
+
+    def iterative_deepening(self, board, time_budget):
+
+        """
+        Alpha-beta to depth 1, 2, 3, ... until the time budget (milliseconds) runs out.
+        :return: best move of the deepest iteration that finished
+        """
+
+        with self.deepening(board, time_budget) as board:
+
+            empty_squares = board.get_empty_squares()
+            best_move = self.order_moves(board, self.ai_player, 0)[0]  # if not even depth 1 finishes
+
+            if len(empty_squares) == 1:
+                return best_move
+
+            for depth in range(1, len(empty_squares) + 1):
+
+                eval, best_move = self.alphabeta(board, depth)
+                self.depth_reached = depth
+
+                # a forced win or loss is already certain, deeper iterations would find the same
+                if abs(eval) > WIN_SCORE - ROWS * COLS:
+                    break
+
+        return best_move
+
+    def evaluate(self, board):
+
+        # lines still open to only one player, weighted by how many squares they already hold
+        position = board.position()
+        score = 0
+
+        for line in WIN_LINES:
+
+            ai_count = 0
+            opponent_count = 0
+
+            for index in line:
+                if position[index] == self.ai_player:
+                    ai_count += 1
+
+                elif position[index] == self.opponent_player:
+                    opponent_count += 1
+
+            if opponent_count == 0 and ai_count > 0:
+                score += 10 ** (ai_count - 1)
+
+            elif ai_count == 0 and opponent_count > 0:
+                score -= 10 ** (opponent_count - 1)
+
+        return score
+
+    def score_moves(self, board=None):
+
+        """
+        Scores every legal move for the AI in one search. On 3x3 the moves share the solved and transposition
+        tables. On larger boards they are searched one ply deeper at a time until time_budget runs out, sharing
+        killer moves, history and the previous depth's best moves.
+        :return: {(row, col): value}, on 3x3 the game-theoretic value (1 win, 0 draw, -1 loss)
+        :return: on larger boards the alpha-beta score of the deepest depth that finished
+        """
+
+        if board is None:
+            board = self.board
+
+        self.nodes = 0
+        scores = {}
+
+        if ROWS * COLS <= 9:  # small enough to search every move to the end
+
+            solved_table = self.get_solved_table()
+
+            for row, col in board.get_empty_squares():
+                board.mark_move(row, col, self.ai_player)
+
+                # the table holds the value for the opponent, who is to move now
+                entry = solved_table.lookup(board.position()) if solved_table else None
+                scores[(row, col)] = -entry[0] if entry is not None else self.minimax(board, 'min')[0]
+
+                board.unmark_move(row, col)
+
+            return scores
+
+        with self.deepening(board, self.time_budget) as board:
+
+            moves = self.order_moves(board, self.ai_player, 0)
+
+            for depth in range(1, len(moves) + 1):
+
+                depth_scores = {}
+
+                for row, col in moves:
+                    board.mark_move(row, col, self.ai_player)
+                    depth_scores[(row, col)] = self.alphabeta(board, depth - 1, max_or_min='min', ply=1)[0]
+                    board.unmark_move(row, col)
+
+                scores = depth_scores
+                self.depth_reached = depth
+
+                # the next depth starts with the best moves so far
+                moves = sorted(moves, key=scores.get, reverse=True)
+
+        if not scores:  # not even depth 1 finished
+            scores = {move: 0 for move in moves}
+
+        return scores
+
+    def hint_moves(self, board=None):
+
+        """
+        The moves score_moves rates best for the AI. Moves tied on the score are ranked by evaluate after the move,
+        on 3x3 most positions are draws and would otherwise all tie.
+        :return: [(row, col), ...] the top moves, more than one only when they are tied on both
+        """
+
+        if board is None:
+            board = self.board
+
+        scores = self.score_moves(board)
+        best = max(scores.values())
+
+        ranks = {}
+        for (row, col), value in scores.items():
+            if value == best:
+                board.mark_move(row, col, self.ai_player)
+                ranks[(row, col)] = self.evaluate(board)
+                board.unmark_move(row, col)
+
+        top = max(ranks.values())
+        return [move for move, rank in ranks.items() if rank == top]
+
+    def medium_move(self, board):
+
+        # one of the best moves most of the time, now and then one of the next best
+        scores = self.score_moves(board)
+        values = sorted(set(scores.values()), reverse=True)
+
+        if len(values) > 1 and random.random() < MEDIUM_MISTAKE_CHANCE:
+            value = values[1]
+        else:
+            value = values[0]
+
+        return random.choice([move for move, move_value in scores.items() if move_value == value])
+
+    def mcts_move(self, board, time_budget):
+
+        """
+        UCT with root parallelism: this process grows the tree kept from the last move, every other worker grows
+        a fresh one, and the visit counts of the root moves are added up.
+        :return: most visited move
+        """
+
+        start = time.perf_counter()
+        deadline = None if self.mcts_iterations else start + time_budget / 1000
+
+        board = copy.deepcopy(board)
+        position = board.position()
+        player_to_move = 1 if board.marked_squares % 2 == 0 else 2
+
+        root = self.kept_mcts_root(position)
+
+        if root is None:
+            root = MCTSNode(None, 3 - player_to_move, None, board)
+
+        workers = max(1, self.mcts_workers)
+        iterations = -(-self.mcts_iterations // workers) if self.mcts_iterations else None
+
+        results = None
+        if workers > 1:
+            worker_budget = None if deadline is None else (deadline - time.perf_counter()) * 1000
+            tasks = [(position, player_to_move, iterations, worker_budget, MCTS_EXPLORATION, random.getrandbits(32))
+                     for _ in range(workers - 1)]
+
+            results = self.get_mcts_pool(workers - 1).map_async(mcts_worker, tasks)
+
+        rollouts = mcts_search(root, board, iterations, deadline, MCTS_EXPLORATION, random, self.cancelled)
+        visits = {move: child.visits for move, child in root.children.items()}
+
+        if results is not None:
+            for worker_visits, worker_rollouts in results.get():
+
+                rollouts += worker_rollouts
+
+                for move, count in worker_visits.items():
+                    visits[move] = visits.get(move, 0) + count
+
+        if visits:
+            best_move = max(visits, key=visits.get)
+        else:  # not even one rollout finished inside the budget
+            best_move = self.order_moves(board, player_to_move, 0)[0]
+
+        self.nodes = rollouts
+        self.rollouts_per_sec = rollouts / (time.perf_counter() - start)
+
+        # the subtree under the chosen move is searched again after the opponent replies
+        self.mcts_root = root.children.get(best_move)
+
+        if self.mcts_root is not None:
+            index = best_move[0] * COLS + best_move[1]
+            self.mcts_position = position[:index] + (player_to_move,) + position[index + 1:]
+
+        return best_move
+
+    def kept_mcts_root(self, position):
+
+        """
+        :return: node of the kept tree for the position, when it is the kept root plus one opponent move
+        :return: None if the tree has to be started again
+        """
+
+        if self.mcts_root is None:
+            return None
+
+        changed = [index for index in range(ROWS * COLS) if self.mcts_position[index] != position[index]]
+
+        if len(changed) != 1 or self.mcts_position[changed[0]] != 0:
+            return None
+
+        node = self.mcts_root.children.get(divmod(changed[0], COLS))
+
+        if node is not None:
+            node.parent = None  # the rest of the old tree can go
+
+        return node
+
+    def ai_move(self, board=None, time_budget=None):  # searches self.board unless another board is given
+
+        if board is None:
+            board = self.board
+
+        self.nodes = 0
+
+        with profiler.span('ai_move', 'ai', mode=self.mode) as span:
+
+            if self.mode == 'random':
+
+                empty_squares = board.get_empty_squares()
+                pos = random.choice(empty_squares)
+
+            elif self.mode == 'medium':
+                pos = self.medium_move(board)
+
+            elif self.mode == 'minimax':
+
+                pos = self.solved_move(board) if self.use_solved_table else None
+
+                if pos is None:
+                    eval, pos = self.minimax(board)
+
+            elif self.mode == 'alphabeta':
+
+                self.killer_moves = {}
+                eval, pos = self.alphabeta(board, self.depth_limit)
+                span.set(depth=self.depth_limit)
+
+            elif self.mode == 'iterative':
+                pos = self.iterative_deepening(board, self.time_budget if time_budget is None else time_budget)
+                span.set(depth=self.depth_reached)
+
+            elif self.mode == 'mcts':
+                pos = self.mcts_move(board, self.time_budget if time_budget is None else time_budget)
+                span.set(rollouts_per_sec=round(self.rollouts_per_sec))
+
+            span.set(nodes=self.nodes)
+
+        return pos
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class MCTSNode:
+    # visit statistics of one position in the Monte Carlo tree, wins count for the player who moved into it
+
+    def __init__(self, move, player, parent, board):  # board holds the node's position
+
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = {}  # move : MCTSNode
+        self.untried = [] if board.state() != 0 or board.isfull() else list(board.get_empty_squares())
+
+        self.visits = 0
+        self.wins = 0.0  # a draw counts as half a win
+
+    def select_child(self, exploration):
+
+        log_visits = mp.log(self.visits)
+
+        return max(self.children.values(),
+                   key=lambda child: child.wins / child.visits + exploration * mp.sqrt(log_visits / child.visits))
+
+
+def mcts_search(root, board, iterations, deadline, exploration, rng, cancelled=None):
+
+    """
+    UCT iterations from root, whose position is on board, until iterations are done or the deadline passes.
+    The board is back in root's position afterwards.
+    :return: number of rollouts played
+    """
+
+    rollouts = 0
+
+    while (iterations is None or rollouts < iterations) and (deadline is None or time.perf_counter() < deadline):
+
+        if cancelled is not None and cancelled.is_set():
+            raise SearchCancelled()
+
+        node = root
+        played = []
+
+        # selection
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            board.mark_move(*node.move, node.player)
+            played.append(node.move)
+
+        # expansion
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            board.mark_move(*move, 3 - node.player)
+            played.append(move)
+
+            child = MCTSNode(move, 3 - node.player, node, board)
+            node.children[move] = child
+            node = child
+
+        # rollout with random moves to the end of the game
+        player = 3 - node.player
+        winner = board.state()
+
+        while winner == 0 and not board.isfull():
+            move = rng.choice(board.get_empty_squares())
+            board.mark_move(*move, player)
+            played.append(move)
+
+            winner = board.state()
+            player = 3 - player
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+
+            if winner == node.player:
+                node.wins += 1
+            elif winner == 0:
+                node.wins += 0.5
+
+            node = node.parent
+
+        for move in reversed(played):
+            board.unmark_move(*move)
+
+        rollouts += 1
+
+    return rollouts
+
+
+def mcts_worker(task):
+
+    # one root parallel search in a worker process, only the visit counts of the root moves go back
+    position, player_to_move, iterations, time_budget, exploration, seed = task
+
+    board = board_from_position(position)
+
+    deadline = None if time_budget is None else time.perf_counter() + time_budget / 1000
+    root = MCTSNode(None, 3 - player_to_move, None, board)
+
+    rollouts = mcts_search(root, board, iterations, deadline, exploration, random.Random(seed))
+
+    return {move: child.visits for move, child in root.children.items()}, rollouts
+
+
+class AIWorker:
+    # runs AI.ai_move, or another search of the AI like hint_moves, on a background thread so the event loop
+    # keeps drawing and handling input
+
+    def __init__(self, ai):
+
+        self.ai = ai
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AI')
+        self.future = None
+        self.start_time = None
+
+    def start(self, search=None):
+
+        # the search works on its own copy, the game board is never touched from the worker
+        self.ai.cancelled.clear()
+        self.future = self.executor.submit(search or self.ai.ai_move, copy.deepcopy(self.ai.board))
+        self.start_time = time.perf_counter()
+
+    def thinking(self):
+        return self.future is not None
+
+    def thinking_time(self):
+        return time.perf_counter() - self.start_time
+
+    def poll(self):
+
+        """
+        :return: None while the search is running
+        :return: the search's result once it is ready, (row, col) for ai_move
+        """
+
+        if self.future is None or not self.future.done():
+            return None
+
+        future = self.future
+        self.future = None
+
+        return future.result()
+
+    def cancel(self):
+
+        if self.future is not None:
+            self.ai.cancelled.set()
+            self.future = None
+
+    def shutdown(self):
+
+        self.cancel()
+        self.executor.shutdown(wait=False)
+
+
+class Board:
+
+    def __init__(self):
+
+        self.board = [[0 for i in range(COLS)] for j in range(ROWS)]
+        self.marked_squares = 0
+
+    def state(self, return_positions=False):
+
+        """
+        :return: 0 if no winner yet
+        :return: 1 if player 1 wins
+        :return: 2 if player 2 wins
+        """
+
+        # check horizontal
+        for row in range(ROWS):
+            if all([self.board[row][0] == self.board[row][col] != 0 for col in range(COLS)]):
+
+                if return_positions:
+                    return (self.board[row][0], 'horizontal', (row, 0), (row, COLS - 1))
+
+                return self.board[row][0]
+
+        # check for vertical
+        for col in range(COLS):
+            if all([self.board[0][col] == self.board[row][col] != 0 for row in range(ROWS)]):
+
+                if return_positions:
+                    return (self.board[0][col], 'vertical', (0, col), (ROWS - 1, col))
+
+                return self.board[0][col]
+
+        # check for diagonal
+        if all([self.board[0][0] == self.board[i][i] != 0 for i in range(ROWS)]):
+
+            if return_positions:
+                return (self.board[0][0], 'down diagonal', (0, 0), (ROWS - 1, COLS - 1))
+
+            return self.board[0][0]
+
+        if all([self.board[0][COLS - 1] == self.board[i][COLS - i - 1] != 0 for i in range(ROWS)]):
+
+            if return_positions:
+                return (self.board[0][COLS - 1], 'up diagonal', (ROWS - 1, 0), (0, COLS - 1))
+
+            return self.board[0][COLS - 1]
+
+        # no win yet
+        return 0
+
+    def mark_move(self, row, col, player):
+
+        self.board[row][col] = player
+        self.marked_squares += 1
+
+    def unmark_move(self, row, col):
+
+        self.board[row][col] = 0
+        self.marked_squares -= 1
+
+    def check_empty(self, row, col):
+        return self.board[row][col] == 0
+
+    def get_empty_squares(self):
+
+        empty_squares = []
+
+        for row in range(ROWS):
+            for col in range(COLS):
+
+                if self.check_empty(row, col):
+                    empty_squares.append((row, col))
+
+        return empty_squares
+
+    def isfull(self):
+        return self.marked_squares == ROWS * COLS
+
+    def position(self):
+        return tuple([square for row in self.board for square in row])
+
+
+class BitBoard:
+    # same interface as Board, stored as one bitmask per player (bit index = row * COLS + col)
+
+    def __init__(self):
+
+        self.masks = [0, 0, 0]  # indexed by player, index 0 unused
+        self.marked_squares = 0
+        self.winner = None  # (player, orientation, first_element, last_element) once a line is complete
+
+    def state(self, return_positions=False):
+
+        """
+        :return: 0 if no winner yet
+        :return: 1 if player 1 wins
+        :return: 2 if player 2 wins
+        """
+
+        if self.winner is None:
+            return 0
+
+        if return_positions:
+            return self.winner
+
+        return self.winner[0]
+
+    def mark_move(self, row, col, player):
+
+        index = row * COLS + col
+        mask = self.masks[player] | (1 << index)
+
+        self.masks[player] = mask
+        self.marked_squares += 1
+
+        if self.winner is None:
+            for win_mask, orientation, first_element, last_element in SQUARE_WIN_MASKS[index]:
+                if mask & win_mask == win_mask:
+                    self.winner = (player, orientation, first_element, last_element)
+                    break
+
+    def unmark_move(self, row, col):
+
+        bit = 1 << (row * COLS + col)
+
+        self.masks[1] &= ~bit
+        self.masks[2] &= ~bit
+        self.marked_squares -= 1
+
+        if self.winner is not None:
+            self.winner = self.find_winner()
+
+    def find_winner(self):
+
+        for win_mask, orientation, first_element, last_element in WIN_MASKS:
+            for player in (1, 2):
+                if self.masks[player] & win_mask == win_mask:
+                    return (player, orientation, first_element, last_element)
+
+        return None
+
+    def check_empty(self, row, col):
+        return not (self.masks[1] | self.masks[2]) >> (row * COLS + col) & 1
+
+    def get_empty_squares(self):
+
+        empty_squares = []
+        empty = ~(self.masks[1] | self.masks[2]) & FULL_MASK
+
+        while empty:
+            lowest = empty & -empty
+            empty_squares.append(divmod(lowest.bit_length() - 1, COLS))
+            empty ^= lowest
+
+        return empty_squares
+
+    def isfull(self):
+        return self.marked_squares == ROWS * COLS
+
+    def position(self):
+
+        player_1, player_2 = self.masks[1], self.masks[2]
+        return tuple([1 if player_1 >> index & 1 else 2 if player_2 >> index & 1 else 0
+                      for index in range(ROWS * COLS)])
+
+
+def new_board():
+
+    if BOARD_BACKEND == 'bitboard':
+        return BitBoard()
+
+    return Board()
+
+
+def board_from_position(position):
+
+    # a board rebuilt from Board.position(), for boards sent between processes or over the network as flat tuples
+    board = new_board()
+
+    for index, player in enumerate(position):
+        if player != 0:
+            board.mark_move(*divmod(index, COLS), player)
+
+    return board
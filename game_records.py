@@ -0,0 +1,136 @@
+import os
+import struct
+import time
+from collections import namedtuple
+from constants import *
+
+# Every played game appended to one binary file: a file header, then for each game a fixed size header and one byte
+# per move (row * COLS + col, player 1 always moves first)
+
+FILE_HEADER = struct.Struct('<4sBBBx')  # magic, version, rows, cols
+RECORD_HEADER = struct.Struct('<BBBBIIIB')  # game mode, ai mode, ai player, result, start time, duration ms, ai ms, moves
+MAGIC = b'TTTR'
+VERSION = 1
+
+GAME_MODES = ('pvp', 'ai')
+AI_MODES = ('random', 'medium', 'minimax', 'alphabeta', 'iterative', 'mcts')
+NO_AI_MODE = 0xFF
+UNFINISHED = 3  # result of a game left before it ended, otherwise 0 for a draw or the winning player
+
+GameRecord = namedtuple('GameRecord', 'game_mode ai_mode ai_player result start_time duration ai_time moves')
+
+
+class GameRecorder:
+    # collects the moves of the game being played and appends the game to the file when it ends
+
+    def __init__(self, path):
+
+        self.path = path
+        self.enabled = True
+        self.compatible = None  # whether the file on disk is for this board size, checked on the first write
+
+        self.moves = None  # None while no game is being recorded
+        self.header = None
+        self.start_time = None
+        self.start_clock = None
+        self.ai_time = 0
+
+    def start(self, game_mode, ai_mode, ai_player):
+
+        if not self.enabled:
+            return
+
+        self.moves = bytearray()
+        self.header = (GAME_MODES.index(game_mode), AI_MODES.index(ai_mode) if ai_mode in AI_MODES else NO_AI_MODE,
+                       ai_player or 0)
+
+        self.start_time = int(time.time())
+        self.start_clock = time.perf_counter()
+        self.ai_time = 0
+
+    def add_move(self, row, col):
+
+        if self.moves is not None:
+            self.moves.append(row * COLS + col)
+
+    def add_ai_time(self, seconds):
+        self.ai_time += seconds
+
+    def finish(self, result):
+
+        if self.moves is None:
+            return
+
+        moves = self.moves
+        self.moves = None
+
+        game_mode, ai_mode, ai_player = self.header
+        duration = round((time.perf_counter() - self.start_clock) * 1000)
+
+        record = RECORD_HEADER.pack(game_mode, ai_mode, ai_player, result, self.start_time, duration,
+                                    round(self.ai_time * 1000), len(moves)) + bytes(moves)
+
+        try:
+            if self.compatible is None:
+                self.compatible = self.check_file()
+
+            if not self.compatible:
+                return
+
+            with open(self.path, 'ab') as f:
+
+                if f.tell() == 0:
+                    f.write(FILE_HEADER.pack(MAGIC, VERSION, ROWS, COLS))
+
+                f.write(record)
+
+        except OSError:
+            pass  # a game that can't be recorded must not stop the next one
+
+    def check_file(self):
+
+        # a file written for another board size or version is left alone
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return True
+
+        with open(self.path, 'rb') as f:
+            return f.read(FILE_HEADER.size) == FILE_HEADER.pack(MAGIC, VERSION, ROWS, COLS)
+
+
+def read_records(path):
+
+    """
+    Reads one record at a time, so files of any size can be streamed.
+    :return: generator of GameRecord, moves as (row, col), a record cut short by a crash ends it
+    """
+
+    with open(path, 'rb') as f:
+
+        header = f.read(FILE_HEADER.size)
+
+        if len(header) < FILE_HEADER.size:
+            return
+
+        magic, version, rows, cols = FILE_HEADER.unpack(header)
+
+        if magic != MAGIC or version != VERSION or (rows, cols) != (ROWS, COLS):
+            raise ValueError(f'{path} is not a game record file for a {ROWS}x{COLS} board')
+
+        squares = [divmod(square, COLS) for square in range(ROWS * COLS)]
+
+        while True:
+
+            header = f.read(RECORD_HEADER.size)
+
+            if len(header) < RECORD_HEADER.size:
+                return
+
+            game_mode, ai_mode, ai_player, result, start_time, duration, ai_time, count = RECORD_HEADER.unpack(header)
+            moves = f.read(count)
+
+            if len(moves) < count:
+                return
+
+            yield GameRecord(GAME_MODES[game_mode], None if ai_mode == NO_AI_MODE else AI_MODES[ai_mode],
+                             ai_player or None, result, start_time, duration, ai_time,
+                             [squares[square] for square in moves])
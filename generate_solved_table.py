@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+from constants import *
+from engine import AI, SolvedTable, WIN_LINES, base_dir, board_from_position
+
+
+def winner(position):
+
+    for line in WIN_LINES:
+        first = position[line[0]]
+
+        if first != 0 and all([position[index] == first for index in line]):
+            return first
+
+    return 0
+
+
+def solve(position, player, solved):
+
+    """
+    Negamax over every position reachable from the given one.
+    :return: value of the position for the player to move (1 win, 0 draw, -1 loss)
+    """
+
+    index = SolvedTable.position_index(position)
+
+    if index in solved:
+        return solved[index][1]
+
+    if winner(position):  # the player who just moved has won
+        value, move = -1, None
+
+    elif 0 not in position:
+        value, move = 0, None
+
+    else:
+        # first best square in row-major order, the same choice AI.minimax makes
+        value, move = -2, None
+
+        for square in range(ROWS * COLS):
+
+            if position[square] != 0:
+                continue
+
+            child = position[:square] + (player,) + position[square + 1:]
+            child_value = -solve(child, 3 - player, solved)
+
+            if child_value > value:
+                value = child_value
+                move = divmod(square, COLS)
+
+    solved[index] = (position, value, move)
+    return value
+
+
+def verify(solved, table):
+
+    # every entry must agree with the file and with a live minimax search
+    for index, (position, value, move) in solved.items():
+
+        assert table.lookup(position) == (value, move), f'file entry differs for {position}'
+
+        board = board_from_position(position)
+
+        if move is None:
+            assert board.state() != 0 or board.isfull(), f'{position} is not over'
+            continue
+
+        player_to_move = 1 if board.marked_squares % 2 == 0 else 2
+        ai = AI(board, 'minimax', player_to_move)
+
+        live_value = ai.minimax(board)[0]
+        assert live_value == value, f'minimax gives {live_value} for {position}, table gives {value}'
+
+        board.mark_move(*move, player_to_move)
+        move_value = ai.minimax(board, 'min')[0]
+        assert move_value == value, f'table move {move} for {position} is worth {move_value}, not {value}'
+
+
+def main(path):
+
+    if ROWS * COLS > 9:
+        sys.exit(f'A solved table is only practical for 3x3, the board is {ROWS}x{COLS}')
+
+    start = time.perf_counter()
+
+    solved = {}
+    solve(tuple([0] * (ROWS * COLS)), 1, solved)
+
+    data = bytearray([SolvedTable.NO_ENTRY]) * (3 ** (ROWS * COLS))
+    for index, (position, value, move) in solved.items():
+        data[index] = SolvedTable.encode(value, move)
+
+    header = SolvedTable.HEADER.pack(SolvedTable.MAGIC, SolvedTable.VERSION, ROWS, COLS)
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(header + data)
+    os.replace(temporary_path, path)
+
+    print(f'{len(solved)} positions written to {path} in {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    verify(solved, SolvedTable(path))
+    print(f'All positions match minimax ({time.perf_counter() - start:.2f}s)')
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        main(os.path.join(base_dir, SOLVED_TABLE_FILE))
@@ -0,0 +1,159 @@
+"""
+Plays many games against server.py at once and reports the sessions finished per second and the move latencies.
+
+    python load_test.py --start-server --clients 1000 --duration 20
+    python load_test.py --engine iterative:50 --port 6000
+
+A session is one connection playing one game to the end: NEW, then random MOVEs for one side and AI for the other.
+Latency runs from sending a request to reading its reply. MOVE latency shows how well the event loop keeps up,
+AI latency adds the search and the wait for a free worker.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from constants import *
+from engine import base_dir
+from tournament import percentile
+
+
+async def request(reader, writer, line, times=None):
+
+    start = time.perf_counter()
+
+    writer.write(line.encode() + b'\n')
+    await writer.drain()
+    reply = (await reader.readline()).decode().split()
+
+    if times is not None:
+        times.append((time.perf_counter() - start) * 1000)
+
+    if not reply or reply[0] != 'OK':
+        raise RuntimeError(f'{line!r} was answered with {" ".join(reply)!r}')
+
+    return reply[1:]
+
+
+async def play_session(host, port, engine, rng, stats):
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        state = await request(reader, writer, f'NEW {engine}')
+        human = rng.choice((1, 2))
+
+        while state[1] == 'turn':
+
+            if int(state[2]) == human:
+                row, col = divmod(rng.choice([index for index, square in enumerate(state[0]) if square == '0']), COLS)
+                state = await request(reader, writer, f'MOVE {row} {col}', stats['move'])
+
+            else:
+                state = await request(reader, writer, 'AI', stats['ai'])
+
+        writer.write(b'QUIT\n')
+        await writer.drain()
+
+    finally:
+        writer.close()
+
+
+async def client(args, rng, stats, deadline):
+
+    while time.perf_counter() < deadline:
+
+        try:
+            await play_session(args.host, args.port, args.engine, rng, stats)
+            stats['sessions'] += 1
+
+        except (OSError, RuntimeError, IndexError, ValueError) as error:
+
+            stats['errors'] += 1
+            stats.setdefault('first error', repr(error))
+
+            await asyncio.sleep(0.1)  # a refused connection is tried again, not spun on
+
+
+async def run(args):
+
+    stats = {'sessions': 0, 'errors': 0, 'move': [], 'ai': []}
+    deadline = time.perf_counter() + args.duration
+
+    await asyncio.gather(*(client(args, random.Random(args.seed + number), stats, deadline)
+                           for number in range(args.clients)))
+
+    return stats
+
+
+def wait_for_server(host, port, timeout):
+
+    async def connect():
+
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.close()
+
+    give_up = time.perf_counter() + timeout
+
+    while True:
+        try:
+            asyncio.run(connect())
+            return
+
+        except OSError:
+            if time.perf_counter() > give_up:
+                raise
+
+            time.sleep(0.1)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Load test server.py with many concurrent games.')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--clients', type=int, default=1000, help='connections playing at the same time')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to keep starting sessions')
+    parser.add_argument('--engine', default=HARD_AI_MODE, help='MODE[:OPTION] as in tournament.py')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start-server', action='store_true', help='run server.py for the test')
+    args = parser.parse_args()
+
+    server = None
+
+    if args.start_server:
+        server = subprocess.Popen([sys.executable, os.path.join(base_dir, 'server.py'), '--host', args.host,
+                                   '--port', str(args.port)], stdout=subprocess.DEVNULL)
+
+    try:
+        wait_for_server(args.host, args.port, 10 if server else 0)
+
+        start = time.perf_counter()
+        stats = asyncio.run(run(args))
+        elapsed = time.perf_counter() - start
+
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f'{stats["sessions"]} sessions in {elapsed:.1f}s with {args.clients} clients '
+          f'({stats["sessions"] / elapsed:.1f} sessions/s), {stats["errors"]} errors')
+
+    for name in ('move', 'ai'):
+        times = stats[name]
+        print(f'{name:>5} ms  p50 {percentile(times, 50):.2f}  p99 {percentile(times, 99):.2f}  '
+              f'max {max(times, default=0):.2f}  ({len(times)} requests)')
+
+    if stats['errors']:
+        print(f'first error: {stats["first error"]}')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
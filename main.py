@@ -1,201 +1,599 @@
 import sys
 import os
-import pickle
-import copy
 import math as mp
-import random
+import threading
+import time
+from collections import OrderedDict, deque
 from constants import *
+from engine import AI, AIWorker, WIN_MASKS, new_board
+from settings import DEFAULT_SETTINGS, SettingsStore
+from profiling import profiler
+from game_records import UNFINISHED, GameRecorder
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
 import pygame as pg
 
-pg.init()
+# only what the first frame needs, the mixer is started by the asset thread and nothing else is used
+pg.display.init()
+pg.font.init()
 
-screen = pg.display.set_mode((WIDTH, HEIGHT))
+screen = pg.display.set_mode((WIDTH, HEIGHT), pg.RESIZABLE)
 pg.display.set_caption('Tic Tac Toe')
 
 base_dir = os.path.dirname(__file__)
 
-ICON = pg.image.load(os.path.join(base_dir, ICON_FILE))
-pg.display.set_icon(ICON)
+settings = SettingsStore(os.path.join(base_dir, DATA_FILE))
+
+recorder = GameRecorder(os.path.join(base_dir, RECORDS_FILE))
+recorder.enabled = RECORD_GAMES
 
 clock = pg.time.Clock()
 
-CLICK_SOUND = pg.mixer.Sound(os.path.join(base_dir, CLICK_SOUND_FILE))
-WIN_SOUND = pg.mixer.Sound(os.path.join(base_dir, WIN_SOUND_FILE))
 
+class Assets:
+    # the icon and sounds are decoded on a background thread once the first frame is up
+
+    def __init__(self):
 
-class AI:
+        self.icon = None
+        self.icon_shown = False
+        self.sounds = {}  # name : Sound, empty until loaded or without an audio device
+        self.loaded = threading.Event()
 
-    def __init__(self, board, ai_mode, ai_player):  # Game Modes available : 'random' and 'minimax'
+    def start_loading(self):
+        threading.Thread(target=self.load, name='Assets', daemon=True).start()
 
-        self.board = board
-        self.mode = ai_mode
-        self.ai_player = ai_player
-        self.opponent_player = self.get_other_player()
+    def load(self):
 
-    def get_other_player(self):
+        try:
+            self.icon = pg.image.load(os.path.join(base_dir, ICON_FILE))
+        except (pg.error, OSError):
+            pass
 
-        players = [1, 2]
-        players.remove(self.ai_player)
-        return players[0]
+        try:
+            pg.mixer.init()
+            self.sounds = {'click': pg.mixer.Sound(os.path.join(base_dir, CLICK_SOUND_FILE)),
+                           'win': pg.mixer.Sound(os.path.join(base_dir, WIN_SOUND_FILE))}
+
+        except (pg.error, OSError):
+            pass  # the game plays silently rather than not at all
+
+        self.loaded.set()
+
+    def show_icon(self):
+
+        # the window belongs to the main thread, so the icon is set from there once it is decoded
+        if self.icon is not None:
+            pg.display.set_icon(self.icon)
+            self.icon_shown = True
+
+    def play(self, name):
+
+        sound = self.sounds.get(name)
+
+        if sound is not None:
+            sound.play()
+
+
+assets = Assets()
+
+
+class Renderer:
+    # pushes only the parts of the window that changed, and keeps static backgrounds as cached layers
+
+    def __init__(self):
+
+        self.dirty_rects = []
+        self.layers = {}
+
+    def mark_dirty(self, rect):
+        self.dirty_rects.append(pg.Rect(rect))
+
+    def mark_all_dirty(self):
+        self.dirty_rects = [screen.get_rect()]
+
+    def update(self):
+
+        if self.dirty_rects:
+            with profiler.span('display update', 'render', rects=len(self.dirty_rects)):
+                pg.display.update(self.dirty_rects)
+
+            self.dirty_rects = []
+
+    def get_layer(self, name, draw):  # draw(surface) paints the layer the first time it is asked for
+
+        if name not in self.layers:
+            layer = pg.Surface(screen.get_size()).convert()
+            draw(layer)
+            self.layers[name] = layer
+
+        return self.layers[name]
+
+    def show_layer(self, name, draw):
+
+        screen.blit(self.get_layer(name, draw), (0, 0))
+        self.mark_all_dirty()
+
+
+renderer = Renderer()
+
+
+class IdleClock:
+    # runs at FPS while something moves or just after input, otherwise sleeps in pg.event.wait
 
-    def minimax(self, board, max_or_min='max'):  # ai is maximising
+    def __init__(self):
+
+        self.last_input = time.perf_counter()
+        self.idle = False
+        self.frame_start = time.perf_counter()
+        self.last_poll = time.perf_counter()
+        self.input_since = time.perf_counter()  # the events tick returned arrived after this time
+        self.frame_cpu_start = time.process_time()
+
+        # wall and CPU time spent in idle frames, to check what an idle window costs
+        self.idle_time = 0
+        self.idle_cpu_time = 0
+
+    def tick(self, animating=False):
+
+        """
+        Waits for the next frame and returns the events that arrived, like clock.tick(FPS) then pg.event.get().
+        """
+
+        now = time.perf_counter()
+        cpu_now = time.process_time()
 
-        case = board.state()
+        if self.idle:
+            self.idle_time += now - self.frame_start
+            self.idle_cpu_time += cpu_now - self.frame_cpu_start
 
-        if case == self.ai_player:
-            return (1, None)
+        self.frame_start = now
+        self.frame_cpu_start = cpu_now
 
-        elif case == self.opponent_player:
-            return (-1, None)
+        self.idle = not animating and now - self.last_input > IDLE_DELAY
 
-        elif board.isfull() and case == 0:
-            return (0, None)
+        if self.idle:
+            event = pg.event.wait(round(1000 / IDLE_FPS))
+            self.input_since = time.perf_counter()  # the wait ends as soon as something arrives
+            clock.tick()
 
-        if max_or_min == 'min':
+            events = [] if event.type == pg.NOEVENT else [event] + pg.event.get()
 
-            min_eval = 100
-            best_move = None
-            empty_squares = board.get_empty_squares()
+        else:
+            clock.tick(FPS)
+            self.input_since = self.last_poll
+            events = pg.event.get()
+
+        self.last_poll = time.perf_counter()
+
+        if events:
+            self.last_input = time.perf_counter()
 
-            for row, col in empty_squares:
+        return events
 
-                temporary_board = copy.deepcopy(board)
-                temporary_board.mark_move(row, col, self.opponent_player)
+    def cpu_per_idle_minute(self):
 
-                eval = self.minimax(temporary_board, 'max')[0]
+        if self.idle_time == 0:
+            return 0
 
-                if eval == -1:
+        return self.idle_cpu_time / self.idle_time * 60
 
-                    min_eval = eval
-                    best_move = (row, col)
 
-                    return (min_eval, best_move)
+idle_clock = IdleClock()
 
-                elif eval < min_eval:
+profiler.enabled = PROFILING
 
-                    min_eval = eval
-                    best_move = (row, col)
 
-            return (min_eval, best_move)
+def quit_game():
 
-        elif max_or_min == 'max':
+    if SHOW_IDLE_STATS:
+        print(f'Idle for {idle_clock.idle_time:.1f}s, '
+              f'{idle_clock.cpu_per_idle_minute():.2f}s of CPU per idle minute')
 
-            max_eval = -100
-            best_move = None
-            empty_squares = board.get_empty_squares()
+    if profiler.events:
+        profiler.export(os.path.join(base_dir, PROFILE_DIR, time.strftime('trace %Y-%m-%d %H-%M-%S.json')))
 
-            for row, col in empty_squares:
+    settings.flush()  # the writer thread is a daemon, anything it has not written yet goes out now
+    pg.quit()
+    sys.exit()
 
-                temporary_board = copy.deepcopy(board)
-                temporary_board.mark_move(row, col, self.ai_player)
 
-                eval = self.minimax(temporary_board, 'min')[0]
+class SurfaceCache:
+    # fonts, rendered text and whole button surfaces, least recently used dropped first
 
-                if eval == 1:
+    def __init__(self, max_size):
 
-                    max_eval = eval
-                    best_move = (row, col)
+        self.max_size = max_size
+        self.entries = OrderedDict()  # keys hold every size, so the entries of a few window scales live side by side
 
-                    return (max_eval, best_move)
+    def get(self, key, create):  # create() makes the entry when it isn't cached
 
-                elif eval > max_eval:
+        entry = self.entries.get(key)
 
-                    max_eval = eval
-                    best_move = (row, col)
+        if entry is None:
+            entry = create()
+            self.entries[key] = entry
 
-            return (max_eval, best_move)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
 
-        raise Exception('The board not found in any case')
+        else:
+            self.entries.move_to_end(key)
+
+        return entry
 
-    def ai_move(self):
+    def font(self, name, size, bold=False, italic=False):
 
-        if self.mode == 'random':
+        # SysFont searches the installed fonts, so it is only called once per font
+        return self.get(('font', name, size, bold, italic),
+                        lambda: pg.font.SysFont(name, size, bold=bold, italic=italic))
 
-            empty_squares = self.board.get_empty_squares()
-            pos = random.choice(empty_squares)
+    def text(self, text, color, name, size, bold=False, italic=False):
 
-        elif self.mode == 'minimax':
+        return self.get(('text', text, color, name, size, bold, italic),
+                        lambda: self.font(name, size, bold, italic).render(text, 1, color).convert_alpha())
 
-            eval, pos = self.minimax(self.board)
 
-        return pos
+surface_cache = SurfaceCache(SURFACE_CACHE_SIZE)
 
 
-class Board:
+class Atlas:
+    # X, O and every win line drawn once for the current scale, so placing a mark is a single blit
 
     def __init__(self):
 
-        self.board = [[0 for i in range(COLS)] for j in range(ROWS)]
-        self.marked_squares = 0
+        self.tile_centers = [[self.center_of_tile(row, col) for col in range(COLS)] for row in range(ROWS)]
+        self.tile_areas = [[pg.Rect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE) for col in range(COLS)]
+                           for row in range(ROWS)]
+        self.tile_rects = [[self.hit_rect(row, col) for col in range(COLS)] for row in range(ROWS)]
 
-    def state(self, return_positions=False):
+        # everything is drawn onto a transparent scratch surface and cut out by its bounding rect
+        self.scratch = pg.Surface(screen.get_size(), pg.SRCALPHA)
+        self.painted = pg.Rect(0, 0, 0, 0)  # part of the scratch surface the last capture drew on
 
-        """
-        :return: 0 if no winner yet
-        :return: 1 if player 1 wins
-        :return: 2 if player 2 wins
-        """
+        self.figures = {}
+        self.hint_figures = {}
+        self.figure_positions = {}
+
+        center_x, center_y = self.tile_centers[0][0]
+
+        for player in (1, 2):
+            figure, (left, top) = self.capture(lambda surface: self.draw_fig(surface, player, (center_x, center_y)))
+
+            self.figures[player] = figure
+
+            self.hint_figures[player] = figure.copy()
+            self.hint_figures[player].set_alpha(HINT_ALPHA)
+            self.figure_positions[player] = [[(x + left - center_x, y + top - center_y) for x, y in row_centers]
+                                             for row_centers in self.tile_centers]
+
+        self.win_lines = {}
+
+        for win_mask, orientation, first_element, last_element in WIN_MASKS:
+            for player in (1, 2):
+                self.win_lines[(player, orientation, first_element)] = self.capture(
+                    lambda surface: self.draw_win_line(surface, player, orientation, first_element, last_element))
+
+        del self.scratch, self.painted
+
+    def capture(self, draw):  # draw(surface) returns the rect it painted
+
+        self.scratch.fill((0, 0, 0, 0), self.painted)  # a new surface starts transparent, only the last drawing goes
+        rect = draw(self.scratch).clip(self.scratch.get_rect())
+        self.painted = rect
+
+        return (self.scratch.subsurface(rect).convert_alpha(), rect.topleft)
+
+    def draw_fig(self, surface, player, center):
+
+        x, y = center
+
+        if player == 1:
+
+            if SHARP_EDGE_CROSS:
+
+                displacement = round((CROSS_LENGTH / mp.sqrt(2)) / 2)
+
+                line1_start = (x - displacement, y - displacement)
+                line1_end = (x + displacement, y + displacement)
+                line2_start = (x - displacement, y + displacement)
+                line2_end = (x + displacement, y - displacement)
+
+                line1_rect = pg.draw.line(surface, CROSS_COLOR, line1_start, line1_end, CIRCLE_WIDTH)
+                line2_rect = pg.draw.line(surface, CROSS_COLOR, line2_start, line2_end, CIRCLE_WIDTH)
+
+                return line1_rect.union(line2_rect)
+
+            else:
+                cross_size = (CROSS_WIDTH, CROSS_LENGTH)
+                rect_surface = pg.Surface(cross_size)
+                rect_surface.set_colorkey((0, 0, 0))
+                rect_surface.fill(CROSS_COLOR)
+
+                line1 = pg.transform.rotate(rect_surface, -45)
+                line2 = pg.transform.rotate(rect_surface, 45)
+                rotated_rect = line1.get_rect(center=center)
+
+                surface.blit(line1, rotated_rect.topleft)
+                return surface.blit(line2, rotated_rect.topleft)
+
+        elif player == 2:
+            return pg.draw.circle(surface, CIRCLE_COLOR, center, CIRCLE_RADIUS, CIRCLE_WIDTH)
+
+    def draw_win_line(self, surface, winner_player, orientation, first_element, last_element):
+
+        if winner_player == 1:
+            color = CROSS_COLOR
+        elif winner_player == 2:
+            color = CIRCLE_COLOR
+
+        if SHARP_EDGE_WIN:
+
+            diagonal_offset = round(OFFSET / mp.sqrt(2))
+
+            row_first, col_first = first_element
+            row_last, col_last = last_element
+
+            x_first_center, y_first_center = self.center_of_tile(row_first, col_first)
+            x_last_center, y_last_center = self.center_of_tile(row_last, col_last)
+
+            if orientation == 'horizontal':
+                line_start = (x_first_center - OFFSET, y_first_center)
+                line_end = (x_last_center + OFFSET, y_last_center)
+
+            elif orientation == 'vertical':
+
+                line_start = (x_first_center, y_first_center - OFFSET)
+                line_end = (x_last_center, y_last_center + OFFSET)
+
+            elif orientation == 'up diagonal':
+
+                line_start = (x_first_center - diagonal_offset, y_first_center + diagonal_offset)
+                line_end = (x_last_center + diagonal_offset, y_last_center - diagonal_offset)
+
+            elif orientation == 'down diagonal':
+
+                line_start = (x_first_center - diagonal_offset, y_first_center - diagonal_offset)
+                line_end = (x_last_center + diagonal_offset, y_last_center + diagonal_offset)
+
+            return pg.draw.line(surface, color, line_start, line_end, WIN_WIDTH)
+
+        if not SHARP_EDGE_WIN:
+
+            row, col = first_element
+            tile_x, tile_y = self.center_of_tile(row, col)
+
+            if orientation in ['up diagonal', 'down diagonal']:
+
+                length = ((ROWS - 1) * mp.sqrt(2) * TILE_SIZE) + (2 * OFFSET)
+                center = (round(WIDTH / 2), round(HEIGHT / 2))
+
+            else:
+                length = (ROWS - 1) * TILE_SIZE + (2 * OFFSET)
+
+            if orientation == 'horizontal':
+                rotation = 90
+                center = (round(WIDTH / 2), tile_y)
+
+            elif orientation == 'vertical':
+                rotation = 0
+                center = (tile_x, round(HEIGHT / 2))
+
+            elif orientation == 'up diagonal':
+                rotation = -45
+
+            elif orientation == 'down diagonal':
+                rotation = 45
+
+            line_surface = pg.Surface((WIN_WIDTH, length))
+            line_surface.set_colorkey((0, 0, 0))
+            line_surface.fill(color)
+
+            line = pg.transform.rotate(line_surface, rotation)
+            rotated_line = line.get_rect(center=center)
+            return surface.blit(line, rotated_line.topleft)
+
+    def hit_rect(self, row, col):
+
+        # the part of a tile that isn't covered by half a grid line on either side
+        line_adjustment = LINE_WIDTH // 2
+
+        left_x = TILE_SIZE * col + (line_adjustment + 1 if col > 0 else 0)
+        right_x = TILE_SIZE * (col + 1) - (line_adjustment if col < COLS - 1 else 0)
 
-        # check horizontal
-        for row in range(ROWS):
-            if all([self.board[row][0] == self.board[row][col] != 0 for col in range(COLS)]):
+        top_y = TILE_SIZE * row + (line_adjustment + 1 if row > 0 else 0)
+        down_y = TILE_SIZE * (row + 1) - (line_adjustment if row < ROWS - 1 else 0)
 
-                if return_positions:
-                    return (self.board[row][0], 'horizontal', (row, 0), (row, COLS - 1))
+        return pg.Rect(left_x, top_y, right_x - left_x, down_y - top_y)
 
-                return self.board[row][0]
+    def center_of_tile(self, row, col):
+        line_adjustment = LINE_WIDTH // 2
+
+        left_x = TILE_SIZE * col
+        right_x = TILE_SIZE * (col + 1)
+
+        top_y = TILE_SIZE * row
+        down_y = TILE_SIZE * (row + 1)
+
+        if col == 0:
+            right_x -= line_adjustment
+
+        elif col == COLS - 1:
+            left_x += line_adjustment
+
+        else:
+            left_x += line_adjustment
+            right_x -= line_adjustment
+
+        if row == 0:
+            down_y -= line_adjustment
+
+        elif row == ROWS - 1:
+            top_y += line_adjustment
 
-        # check for vertical
-        for col in range(COLS):
-            if all([self.board[0][col] == self.board[row][col] != 0 for row in range(ROWS)]):
+        else:
+            top_y += line_adjustment
+            down_y -= line_adjustment
+
+        center_x = round((left_x + right_x) / 2)
+        center_y = round((top_y + down_y) / 2)
+
+        return (center_x, center_y)
 
-                if return_positions:
-                    return (self.board[0][col], 'vertical', (0, col), (ROWS - 1, col))
 
-                return self.board[0][col]
+atlases = OrderedDict()  # FACTOR : Atlas, the least recently used scale is dropped first
 
-        # check for diagonal
-        if all([self.board[0][0] == self.board[i][i] != 0 for i in range(ROWS)]):
 
-            if return_positions:
-                return (self.board[0][0], 'down diagonal', (0, 0), (ROWS - 1, COLS - 1))
+def get_atlas():
 
-            return self.board[0][0]
+    atlas = atlases.get(FACTOR)
 
-        if all([self.board[0][COLS - 1] == self.board[i][COLS - i - 1] != 0 for i in range(ROWS)]):
+    if atlas is None:
+        atlas = atlases[FACTOR] = Atlas()
 
-            if return_positions:
-                return (self.board[0][COLS - 1], 'up diagonal', (ROWS - 1, 0), (0, COLS - 1))
+        if len(atlases) > SCALE_CACHE_SIZE:
+            atlases.popitem(last=False)
 
-            return self.board[0][COLS - 1]
+    else:
+        atlases.move_to_end(FACTOR)
 
-        # no win yet
-        return 0
+    return atlas
 
-    def mark_move(self, row, col, player):
 
-        self.board[row][col] = player
-        self.marked_squares += 1
+def set_scale(factor):
 
-    def check_empty(self, row, col):
-        return self.board[row][col] == 0
+    # every size follows the new scale, the window is made square and backgrounds are painted again when shown
+    global screen, FACTOR, WIDTH, HEIGHT, TILE_SIZE, LINE_WIDTH, CIRCLE_WIDTH, CIRCLE_RADIUS, CROSS_WIDTH, CROSS_LENGTH
+    global WIN_WIDTH, OFFSET, BUTTON_SIZE, BUTTON_BORDER_WIDTH, BUTTON_FONT_SIZE, HEADER_FONT_SIZE, NORMAL_FONT_SIZE
+    global HUD_FONT_SIZE
 
-    def get_empty_squares(self):
+    if factor != FACTOR:
+        sizes = scaled_sizes(factor)
 
-        empty_squares = []
+        FACTOR = sizes.FACTOR
+        WIDTH, HEIGHT = sizes.WIDTH, sizes.HEIGHT
+        TILE_SIZE = sizes.TILE_SIZE
 
-        for row in range(ROWS):
-            for col in range(COLS):
+        LINE_WIDTH = sizes.LINE_WIDTH
+        CIRCLE_WIDTH = sizes.CIRCLE_WIDTH
+        CIRCLE_RADIUS = sizes.CIRCLE_RADIUS
+        CROSS_WIDTH = sizes.CROSS_WIDTH
+        CROSS_LENGTH = sizes.CROSS_LENGTH
+        WIN_WIDTH = sizes.WIN_WIDTH
+        OFFSET = sizes.OFFSET
 
-                if self.check_empty(row, col):
-                    empty_squares.append((row, col))
+        BUTTON_SIZE = sizes.BUTTON_SIZE
+        BUTTON_BORDER_WIDTH = sizes.BUTTON_BORDER_WIDTH
+        BUTTON_FONT_SIZE = sizes.BUTTON_FONT_SIZE
+        HEADER_FONT_SIZE = sizes.HEADER_FONT_SIZE
+        NORMAL_FONT_SIZE = sizes.NORMAL_FONT_SIZE
+        HUD_FONT_SIZE = sizes.HUD_FONT_SIZE
 
-        return empty_squares
+        renderer.layers = {}
 
-    def isfull(self):
-        return self.marked_squares == ROWS * COLS
+    screen = pg.display.set_mode((WIDTH, HEIGHT), pg.RESIZABLE)
+    renderer.mark_all_dirty()
+
+
+def scale_for_window(size):
+
+    # the largest square board that fits, snapped down to SCALE_STEP so it never outgrows the window
+    steps = mp.floor(min(size) / (540 * SCALE_STEP))
+    return max(MIN_FACTOR, round(steps * SCALE_STEP, 2))
+
+
+class PerformanceHUD:
+    # frame time, FPS, input to screen latency and the last AI search over the top left corner, F3 toggles it
+
+    INPUT_EVENTS = (pg.KEYDOWN, pg.MOUSEBUTTONDOWN)
+
+    def __init__(self):
+
+        self.visible = False
+        self.rect = None
+        self.background = None  # screen pixels under the overlay, put back before the next frame draws
+
+        self.frame_starts = deque(maxlen=60)
+        self.frame_time = 0
+        self.latency = 0
+
+    def toggle(self):
+
+        self.visible = not self.visible
+        profiler.enabled = True  # the trace keeps recording once the numbers have been asked for
+
+    def frame_done(self, frame_start, events):  # called once the frame is on the screen
+
+        if not profiler.enabled:
+            return
+
+        now = time.perf_counter()
+
+        self.frame_starts.append(frame_start)
+        self.frame_time = now - frame_start
+
+        # the input arrived after idle_clock.input_since, so this is the longest it can have waited
+        if any(event.type in self.INPUT_EVENTS for event in events):
+            self.latency = now - idle_clock.input_since
+            profiler.record('input to screen', 'input', idle_clock.input_since, now, {})
+
+    def fps(self):
+
+        if len(self.frame_starts) < 2:
+            return 0
+
+        return (len(self.frame_starts) - 1) / (self.frame_starts[-1] - self.frame_starts[0])
+
+    def lines(self):
+
+        lines = [f'frame {self.frame_time * 1000:.1f} ms  {self.fps():.0f} fps',
+                 f'input to screen {self.latency * 1000:.1f} ms']
+
+        for name in ('display update', 'draw_fig', 'show_win'):
+            if name in profiler.latest:
+                lines.append(f'{name} {profiler.latest[name][0] * 1000:.2f} ms')
+
+        if 'ai_move' in profiler.latest:
+            seconds, args = profiler.latest['ai_move']
+            details = ''.join(f'  {key} {value}' for key, value in args.items() if key != 'mode')
+            lines.append(f'AI {args["mode"]} {seconds * 1000:.1f} ms{details}')
+
+        return lines
+
+    def draw(self):
+
+        if not self.visible:
+            return
+
+        # numbers change every frame, so they are rendered directly instead of going through the surface cache
+        font = surface_cache.font(NORMAL_FONT_NAME, HUD_FONT_SIZE)
+        renders = [font.render(line, True, HUD_TEXT_COLOR) for line in self.lines()]
+
+        padding = HUD_FONT_SIZE // 2
+        width = min(screen.get_width(), max(render.get_width() for render in renders) + 2 * padding)
+        height = min(screen.get_height(), sum(render.get_height() for render in renders) + 2 * padding)
+
+        self.rect = pg.Rect(0, 0, width, height)
+        self.background = screen.subsurface(self.rect).copy()
+
+        panel = pg.Surface(self.rect.size, pg.SRCALPHA)
+        panel.fill(HUD_BG_COLOR)
+
+        y = padding
+        for render in renders:
+            panel.blit(render, (padding, y))
+            y += render.get_height()
+
+        renderer.mark_dirty(screen.blit(panel, self.rect))
+
+    def erase(self):
+
+        if self.background is not None:
+            renderer.mark_dirty(screen.blit(self.background, self.rect))
+            self.background = None
+
+
+hud = PerformanceHUD()
 
 
 class Game:
@@ -209,7 +607,9 @@ class Game:
 
     def make_move(self, row, col):
 
+        self.clear_hint()
         self.board.mark_move(row, col, self.cur_player)
+        recorder.add_move(row, col)
         self.draw_fig(row, col)
         self.next_turn()
 
@@ -238,11 +638,16 @@ class Game:
 
     def initialize_game(self):
 
-        with open(os.path.join(base_dir, DATA_FILE), 'rb') as f:
-            data = pickle.load(f)
+        data = settings.get()
+
+        self.cur_player = 1
+        self.running = True
+        self.hint = []  # squares showing a hint
+        self.hint_worker = None  # searching for the hint asked for, until poll_hint draws it
 
         self.game_mode = data['game mode']
-        self.board = Board()
+        self.board = new_board()
+        self.ai = None  # a multiplayer game must not keep the last game's AI and board alive
 
         if self.game_mode == 'ai':
             ai_mode = data['ai mode']
@@ -250,645 +655,828 @@ class Game:
 
             self.ai = AI(self.board, ai_mode, ai_player)
 
-        screen.fill(BG_COLOR)
-        self.draw_lines()
+        recorder.start(self.game_mode, self.ai.mode if self.ai else None, self.ai.ai_player if self.ai else None)
 
-    def start_screen(self):
-        # Buttons
-        if BUTTON_BORDER:
-            button_border = (BUTTON_BORDER_WIDTH, BUTTON_BORDER_COLOR)
-        else:
-            button_border = False
+        renderer.show_layer('grid', self.draw_grid)
+
+    def set_game_data(self, data):
+        settings.update(data)
+
+    def set_variables_to_default(self):
+        settings.update(DEFAULT_SETTINGS)
+
+    def change_ai_player(self):
+
+        self.ai.ai_player = self.ai.get_other_player()
+
+        settings.update({'game mode': self.game_mode, 'ai mode': self.ai.mode, 'ai player': self.ai.ai_player})
+
+    def show_thinking(self, thinking_time):  # thinking_time is None once the AI has moved
+
+        if thinking_time is None or thinking_time < THINKING_INDICATOR_DELAY:
+            caption = 'Tic Tac Toe'
+            cursor = pg.SYSTEM_CURSOR_ARROW
 
-        if BUTTON_HOVER:
-            button_hover = (HOVER_COLOR, HOVER_TEXT_COLOR)
         else:
-            hover_color = False
+            dots = int(thinking_time * 3) % 3 + 1
+            caption = 'Tic Tac Toe - Thinking' + '.' * dots
+            cursor = pg.SYSTEM_CURSOR_WAITARROW
 
-        button_font = BUTTON_FONT_NAME, BUTTON_FONT_SIZE, BUTTON_FONT_COLOR, True, False
+        # only touch the window when something changes
+        if pg.display.get_caption()[0] != caption:
+            pg.display.set_caption(caption)
 
-        def computer_mode_selection():
+        if pg.mouse.get_cursor().data[0] != cursor:
+            pg.mouse.set_cursor(pg.cursors.Cursor(cursor))
 
-            # Buttons
-            hard_mode_button = Button('Hard', BUTTON_SIZE, (round(WIDTH / 2), self.scale_value(320)))
-            easy_mode_button = Button('Easy', BUTTON_SIZE, (round(WIDTH / 2), self.scale_value(220)))
+    def draw_grid(self, surface):
 
-            run = True
-            while run:
+        surface.fill(BG_COLOR)
+        self.draw_lines(surface)
 
-                clock.tick(FPS)
-                screen.fill(BG_COLOR)
+    def draw_lines(self, surface):
 
-                # Displaying
-                hard_mode_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
-                easy_mode_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
+        for i in range(1, COLS):
+            line_x = i * TILE_SIZE
+            pg.draw.line(surface, LINE_COLOR, (line_x, 0), (line_x, HEIGHT), LINE_WIDTH)
 
-                for event in pg.event.get():
+        for j in range(1, ROWS):
+            line_y = j * TILE_SIZE
+            pg.draw.line(surface, LINE_COLOR, (0, line_y), (WIDTH, line_y), LINE_WIDTH)
 
-                    if event.type == pg.QUIT:
-                        pg.quit()
-                        sys.exit()
-                        break
+    def draw_board(self):
 
-                    if event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and hard_mode_button.check_click():
-                        Button.remove_all_buttons()
-                        CLICK_SOUND.play()
+        # the grid, every mark, the hint and the win line again, after the window changed scale
+        renderer.show_layer('grid', self.draw_grid)
+        atlas = get_atlas()
 
-                        data = {'game mode': 'ai', 'ai mode': 'minimax', 'ai player': 2}
-                        run = False
+        for index, player in enumerate(self.board.position()):
+            if player != 0:
+                row, col = divmod(index, COLS)
+                screen.blit(atlas.figures[player], atlas.figure_positions[player][row][col])
 
-                    if event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and easy_mode_button.check_click():
-                        Button.remove_all_buttons()
-                        CLICK_SOUND.play()
+        for row, col in self.hint:
+            screen.blit(atlas.hint_figures[self.cur_player], atlas.figure_positions[self.cur_player][row][col])
 
-                        data = {'game mode': 'ai', 'ai mode': 'random', 'ai player': 2}
-                        run = False
+        state_details = self.board.state(return_positions=True)
 
-                pg.display.update()
+        if state_details != 0:
+            winner_player, orientation, first_element, last_element = state_details
+            line, position = atlas.win_lines[(winner_player, orientation, first_element)]
+            screen.blit(line, position)
 
-            return data
+    def draw_fig(self, row, col):
 
-        def shortcuts_selections():
+        with profiler.span('draw_fig', 'render'):
+            atlas = get_atlas()
+            screen.blit(atlas.figures[self.cur_player], atlas.figure_positions[self.cur_player][row][col])
 
-            # Button
-            back_button = Button('Back', BUTTON_SIZE, (self.scale_value(400), self.scale_value(495)))
+        renderer.mark_dirty(atlas.tile_areas[row][col])
 
-            text = '''
-P : To play multiplayer
-H : To play with Computer - Hard
-E : To play with Computer - Easy
-S : To go to Shortcuts
-Q : To quit
+    def show_hint(self):
 
-ENTER : To restart Game 
-M     : To go to Main Menu'''
+        # the moves are scored on a worker thread, a larger board can take up to HINT_TIME_BUDGET
+        self.clear_hint()
 
-            lines = text.split('\n')
+        hint_ai = AI(self.board, 'medium', self.cur_player)
+        hint_ai.time_budget = HINT_TIME_BUDGET
 
-            text_font = pg.font.SysFont(NORMAL_FONT_NAME, NORMAL_FONT_SIZE)
-            line_height = 10
+        def hint_moves(board):
 
-            run = True
-            while run:
+            with profiler.span('hint', 'ai') as span:
+                moves = hint_ai.hint_moves(board)
+                span.set(nodes=hint_ai.nodes)
 
-                clock.tick(FPS)
-                screen.fill(BG_COLOR)
+            return moves
 
-                back_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
+        self.hint_worker = AIWorker(hint_ai)
+        self.hint_worker.start(hint_moves)
 
-                x, y = (self.scale_value(30), self.scale_value(15))
+    def poll_hint(self):
 
-                for line in lines:
-                    text_render = text_font.render(line, 1, NORMAL_FONT_COLOR)
-                    screen.blit(text_render, (x, y))
+        # faded marks of the player to move on the squares the AI rates best for them, once the search is done
+        if self.hint_worker is None:
+            return
 
-                    text_height = text_render.get_height()
-                    y += text_height + line_height
+        moves = self.hint_worker.poll()
 
-                for event in pg.event.get():
+        if moves is None:
+            return
 
-                    if event.type == pg.QUIT:
+        self.cancel_hint()  # done, the worker's thread is let go
+        self.hint = moves
 
-                        pg.quit()
-                        sys.exit()
-                        run = False
+        atlas = get_atlas()
 
-                    elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and back_button.check_click():
+        for row, col in self.hint:
+            screen.blit(atlas.hint_figures[self.cur_player], atlas.figure_positions[self.cur_player][row][col])
+            renderer.mark_dirty(atlas.tile_areas[row][col])
 
-                        Button.remove_all_buttons()
-                        CLICK_SOUND.play()
+    def cancel_hint(self):
 
-                        self.start_screen()
-                        run = False
+        if self.hint_worker is not None:
+            self.hint_worker.shutdown()
+            self.hint_worker = None
 
-                pg.display.update()
+    def clear_hint(self):
 
-        # Header
-        header_pos = (round(WIDTH / 2), self.scale_value(75))
-        header_font = pg.font.SysFont(HEADER_FONT_NAME, HEADER_FONT_SIZE, bold=True)
+        self.cancel_hint()  # a hint still being searched would be for a board that has changed
 
-        header_render = header_font.render('TIC TAC TOE', 1, HEADER_FONT_COLOR)
-        header_text_rect = header_render.get_rect(center=header_pos)
+        grid = renderer.get_layer('grid', self.draw_grid)
+        atlas = get_atlas()
 
-        # Buttons
+        for row, col in self.hint:
+            tile = atlas.tile_rects[row][col]
+            renderer.mark_dirty(screen.blit(grid, tile, tile))
 
-        multiplayer_button = Button('Multiplayer', BUTTON_SIZE, (round(WIDTH / 2), self.scale_value(175)))
-        computer_button = Button('Computer', BUTTON_SIZE, (round(WIDTH / 2), self.scale_value(275)))
-        shortcuts_button = Button('Shortcuts', BUTTON_SIZE, (round(WIDTH / 2), self.scale_value(375)))
-        quit_button = Button('Quit', BUTTON_SIZE, (round(WIDTH / 2), self.scale_value(475)))
+        self.hint = []
 
-        run = True
-        while run:
+    def show_win(self, winner_player, orientation, first_element, last_element):
 
-            clock.tick(FPS)
-            screen.fill(BG_COLOR)
+        assets.play('win')
 
-            # Displaying
+        with profiler.span('show_win', 'render'):
+            line, position = get_atlas().win_lines[(winner_player, orientation, first_element)]
+            renderer.mark_dirty(screen.blit(line, position))
 
-            screen.blit(header_render, header_text_rect.topleft)
-            multiplayer_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
-            computer_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
-            shortcuts_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
-            quit_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
+    def tile_at(self, x, y):
 
-            for event in pg.event.get():
+        """
+        :return: (row, col) of the tile under the point
+        :return: None if the point is on a grid line or outside the board
+        """
 
-                if ((event.type == pg.KEYDOWN and event.key == pg.K_p) or
-                        (event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and multiplayer_button.check_click())):
+        row = y // TILE_SIZE
+        col = x // TILE_SIZE
 
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+        if row < ROWS and col < COLS and get_atlas().tile_rects[row][col].collidepoint(x, y):
+            return (row, col)
 
-                    data = {'game mode': 'pvp', 'ai mode': None, 'ai player': None}
-                    self.set_game_data(data)
-                    run = False
+        return None
 
-                elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and computer_button.check_click():
+    def scale_value(self, value, factor=None):
 
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+        return round(value * (FACTOR if factor is None else factor))
 
-                    data = computer_mode_selection()
-                    self.set_game_data(data)
-                    run = False
 
-                elif event.type == pg.KEYDOWN and event.key == pg.K_h:
+class WidgetManager:
+    # owns the buttons of one screen, finds the hovered one once per mouse event and sets the cursor on changes
 
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+    CELL_SIZE = 64  # buttons are bucketed by the grid cells they overlap
 
-                    data = {'game mode': 'ai', 'ai mode': 'minimax', 'ai player': 2}
-                    self.set_game_data(data)
-                    run = False
+    def __init__(self):
 
-                elif event.type == pg.KEYDOWN and event.key == pg.K_e:
+        self.buttons = []
+        self.cells = {}  # (cell_x, cell_y) : buttons overlapping that cell
+        self.hovered = None
 
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+    def add(self, button):
 
-                    data = {'game mode': 'ai', 'ai mode': 'random', 'ai player': 2}
-                    self.set_game_data(data)
-                    run = False
+        self.buttons.append(button)
 
-                elif ((event.type == pg.KEYDOWN and event.key == pg.K_s) or
-                      (event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and shortcuts_button.check_click())):
+        left, top = button.button.left // self.CELL_SIZE, button.button.top // self.CELL_SIZE
+        right, bottom = (button.button.right - 1) // self.CELL_SIZE, (button.button.bottom - 1) // self.CELL_SIZE
 
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+        for cell_x in range(left, right + 1):
+            for cell_y in range(top, bottom + 1):
+                self.cells.setdefault((cell_x, cell_y), []).append(button)
 
-                    shortcuts_selections()
-                    run = False
+        # the mouse may already be resting on a new screen's button
+        self.set_hovered(self.button_at(pg.mouse.get_pos()))
 
-                elif ((event.type == pg.QUIT) or (event.type == pg.KEYDOWN and event.key == pg.K_q) or
-                      (event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and quit_button.check_click())):
+        return button
 
-                    pg.quit()
-                    sys.exit()
-                    run = False
+    def button_at(self, pos):
 
-            pg.display.update()
+        x, y = pos
 
-    def end_screen(self):
+        for button in self.cells.get((x // self.CELL_SIZE, y // self.CELL_SIZE), []):
+            if button.button.collidepoint(pos):
+                return button
 
-        # Surface
-        surface = pg.Surface(screen.get_size()).convert_alpha()
-        surface.set_alpha(20)
-        surface.fill(BG_COLOR)
+        return None
 
-        # Header
-        header_font_size = HEADER_FONT_SIZE
+    def set_hovered(self, button):
 
-        if self.final_state == 0:
-            header_text = 'DRAW'
+        if button is self.hovered:
+            return
 
-        elif self.game_mode == 'pvp':
+        if self.hovered is None:
+            pg.mouse.set_cursor(pg.cursors.Cursor(pg.SYSTEM_CURSOR_HAND))
 
-            if self.final_state == 1:
-                header_text = 'X WON'
+        elif button is None:
+            pg.mouse.set_cursor(pg.cursors.Cursor(pg.SYSTEM_CURSOR_ARROW))
 
-            elif self.final_state == 2:
-                header_text = 'O WON'
+        self.hovered = button
 
-        elif self.game_mode == 'ai':
+    def update(self, events):
 
-            if self.final_state == self.ai.ai_player:
-                header_text = 'COMPUTER WON'
-                header_font_size = 50
+        for event in events:
+            if event.type == pg.MOUSEMOTION:
+                self.set_hovered(self.button_at(event.pos))
 
-            else:
-                header_text = 'YOU WON'
+    def clicked(self, event):
 
-        header_pos = (round(WIDTH / 2), self.scale_value(100))
-        header_font = pg.font.SysFont(HEADER_FONT_NAME, header_font_size, bold=True)
+        """
+        :return: the button under a left click
+        :return: None for any other event
+        """
 
-        header_render = header_font.render(header_text, 1, HEADER_FONT_COLOR)
-        header_text_rect = header_render.get_rect(center=header_pos)
+        if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+            return self.button_at(event.pos)
+
+        return None
+
+    def draw(self, font_info, box_color, border=None, hover=None):
+
+        for button in self.buttons:
+            button.blit(font_info, box_color, border, hover, button is self.hovered)
+
+    def invalidate(self):
+
+        for button in self.buttons:
+            button.invalidate()
+
+    def close(self):  # called when leaving the screen
+
+        self.set_hovered(None)
+        self.buttons = []
+        self.cells = {}
+
+
+class Button:
+
+    def __init__(self, text, size, pos):
+
+        self.text = text
+        self.pos = pos
+        self.button = pg.Rect(0, 0, size[0], size[1])
+        self.button.center = self.pos
+        self.drawn_hover = None  # hover state currently on screen, None if it needs drawing
+
+    def invalidate(self):
+        self.drawn_hover = None
+
+    def blit(self, font_info, box_color, border=None, hover=None, hovering=False):
+
+        font_name, font_size, font_color, bold, italic = font_info
+
+        if hovering == self.drawn_hover:
+            return
+
+        self.drawn_hover = hovering
+
+        if hover and hovering:
+            color, font_color = hover
 
-        # Buttons
-        if BUTTON_BORDER:
-            button_border = (BUTTON_BORDER_WIDTH, BUTTON_BORDER_COLOR)
         else:
-            button_border = False
+            color = box_color
+
+        key = ('button', self.text, self.button.size, font_name, font_size, font_color, bold, italic, color, border)
+        button_surface = surface_cache.get(key, lambda: self.render(font_info, font_color, color, border))
+
+        renderer.mark_dirty(screen.blit(button_surface, self.button.topleft))
+
+    def render(self, font_info, font_color, color, border):
+
+        font_name, font_size, _, bold, italic = font_info
+
+        button_surface = pg.Surface(self.button.size, pg.SRCALPHA)
+        button_rect = button_surface.get_rect()
+
+        if border:
+            border_width, border_color = border
+
+            border_width_scale = 1 - border_width / self.button.width
+            border_height_scale = 1 - border_width / self.button.height
+
+            pg.draw.rect(button_surface, border_color, button_rect, 0, BUTTON_RADIUS)
+            self.border = button_rect.scale_by(border_width_scale, border_height_scale)
+            pg.draw.rect(button_surface, color, self.border, 0, BUTTON_RADIUS)
 
-        if BUTTON_HOVER:
-            button_hover = (HOVER_COLOR, HOVER_TEXT_COLOR)
         else:
-            hover_color = False
+            pg.draw.rect(button_surface, color, button_rect, 0, BUTTON_RADIUS)
 
-        button_font = BUTTON_FONT_NAME, BUTTON_FONT_SIZE, BUTTON_FONT_COLOR, True, False
+        text_render = surface_cache.text(self.text, font_color, font_name, font_size, bold, italic)
+        text_rect = text_render.get_rect(center=button_rect.center)
 
-        restart_button_pos = (round(WIDTH / 2), self.scale_value(220))
-        restart_button = Button('Restart', BUTTON_SIZE, restart_button_pos)
+        button_surface.blit(text_render, text_rect.topleft)
 
-        main_menu_button_pos = (round(WIDTH / 2), self.scale_value(320))
-        main_menu_button = Button('Menu', BUTTON_SIZE, main_menu_button_pos)
+        return button_surface.convert_alpha()
 
-        run = True
-        while run:
+    def __repr__(self):
+        return f'{self.text} Button'
 
-            surface.fill(BG_COLOR)
-            clock.tick(FPS)
 
-            # Displaying
-            screen.blit(surface, (0, 0))
-            screen.blit(header_render, header_text_rect.topleft)
-            restart_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
-            main_menu_button.blit(button_font, BUTTON_COLOR, button_border, button_hover)
+class Scene:
+    # one screen of the game, frame(events) runs once per frame and names the next scene instead of calling it
 
-            for event in pg.event.get():
+    animating = False  # keeps the idle clock at full frame rate while True
 
-                if event.type == pg.QUIT:
-                    pg.quit()
-                    sys.exit()
-                    break
+    button_hover = (HOVER_COLOR, HOVER_TEXT_COLOR) if BUTTON_HOVER else False
 
-                if ((event.type == pg.KEYDOWN and event.key == pg.K_m) or
-                        (event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and main_menu_button.check_click())):
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+    def __init__(self, game):
 
-                    self.set_variables_to_default()
-                    main()
-                    run = False
+        self.game = game
+        self.widgets = WidgetManager()
 
-                if ((event.type == pg.KEYDOWN and event.key == pg.K_RETURN) or
-                        (event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and restart_button.check_click())):
+    def enter(self):
+        pass
 
-                    Button.remove_all_buttons()
-                    CLICK_SOUND.play()
+    def frame(self, events):
 
-                    if self.game_mode == 'ai':
-                        self.change_ai_player()
+        """
+        :return: name of the scene to switch to, 'quit' to close the game
+        :return: None to stay on this scene
+        """
 
-                    main(restart=True)
-                    run = False
+        return None
 
-            pg.display.update()
+    def exit(self):
+        self.widgets.close()
 
-    def set_game_data(self, data):
+    def resize(self):  # the window changed scale, the screen is laid out again
 
-        with open(os.path.join(base_dir, DATA_FILE), 'wb') as f:
-            pickle.dump(data, f)
+        self.exit()
+        self.enter()
 
-    def set_variables_to_default(self):
+    @property
+    def button_font(self):
+        return BUTTON_FONT_NAME, BUTTON_FONT_SIZE, BUTTON_FONT_COLOR, True, False
 
-        with open(os.path.join(base_dir, DATA_FILE), 'wb') as f:
-            data = {'game mode': 'pvp', 'ai mode': None, 'ai player': None}
-            pickle.dump(data, f)
+    @property
+    def button_border(self):
+        return (BUTTON_BORDER_WIDTH, BUTTON_BORDER_COLOR) if BUTTON_BORDER else False
 
-    def change_ai_player(self):
+    def draw_widgets(self):
+        self.widgets.draw(self.button_font, BUTTON_COLOR, self.button_border, self.button_hover)
 
-        self.ai.ai_player = self.ai.get_other_player()
 
-        with open(os.path.join(base_dir, DATA_FILE), 'wb') as f:
-            data = {'game mode': self.game_mode, 'ai mode': self.ai.mode, 'ai player': self.ai.ai_player}
-            pickle.dump(data, f)
+class MenuScene(Scene):
 
-    def draw_lines(self):
+    def enter(self):
 
-        for i in range(1, COLS):
-            line_x = i * TILE_SIZE
-            pg.draw.line(screen, LINE_COLOR, (line_x, 0), (line_x, HEIGHT), LINE_WIDTH)
+        scale_value = self.game.scale_value
+        center_x = round(WIDTH / 2)
 
-        for j in range(1, ROWS):
-            line_y = j * TILE_SIZE
-            pg.draw.line(screen, LINE_COLOR, (0, line_y), (WIDTH, line_y), LINE_WIDTH)
+        self.widgets = WidgetManager()
+        self.multiplayer_button = self.widgets.add(Button('Multiplayer', BUTTON_SIZE, (center_x, scale_value(175))))
+        self.computer_button = self.widgets.add(Button('Computer', BUTTON_SIZE, (center_x, scale_value(275))))
+        self.shortcuts_button = self.widgets.add(Button('Shortcuts', BUTTON_SIZE, (center_x, scale_value(375))))
+        self.quit_button = self.widgets.add(Button('Quit', BUTTON_SIZE, (center_x, scale_value(475))))
 
-    def draw_fig(self, row, col):
+        renderer.show_layer('start', self.draw_header)
 
-        center = self.center_of_tile(row, col)
-        x, y = center
+    def draw_header(self, surface):
 
-        if self.cur_player == 1:
+        surface.fill(BG_COLOR)
 
-            if SHARP_EDGE_CROSS:
+        header_pos = (round(WIDTH / 2), self.game.scale_value(75))
+        header_render = surface_cache.text('TIC TAC TOE', HEADER_FONT_COLOR, HEADER_FONT_NAME, HEADER_FONT_SIZE,
+                                           bold=True)
+        header_text_rect = header_render.get_rect(center=header_pos)
 
-                displacement = round((CROSS_LENGTH / mp.sqrt(2)) / 2)
+        surface.blit(header_render, header_text_rect.topleft)
 
-                line1_start = (x - displacement, y - displacement)
-                line1_end = (x + displacement, y + displacement)
-                line2_start = (x - displacement, y + displacement)
-                line2_end = (x + displacement, y - displacement)
+    def frame(self, events):
 
-                pg.draw.line(screen, CROSS_COLOR, line1_start, line1_end, CIRCLE_WIDTH)
-                pg.draw.line(screen, CROSS_COLOR, line2_start, line2_end, CIRCLE_WIDTH)
+        self.widgets.update(events)
+        self.draw_widgets()
 
-            else:
-                cross_size = (CROSS_WIDTH, CROSS_LENGTH)
-                rect_surface = pg.Surface(cross_size)
-                rect_surface.set_colorkey((0, 0, 0))
-                rect_surface.fill(CROSS_COLOR)
+        for event in events:
 
-                line1 = pg.transform.rotate(rect_surface, -45)
-                line2 = pg.transform.rotate(rect_surface, 45)
-                rotated_rect = line1.get_rect(center=center)
+            clicked = self.widgets.clicked(event)
 
-                screen.blit(line1, rotated_rect.topleft)
-                screen.blit(line2, rotated_rect.topleft)
+            if ((event.type == pg.KEYDOWN and event.key == pg.K_p) or
+                    clicked is self.multiplayer_button):
 
-        elif self.cur_player == 2:
-            pg.draw.circle(screen, CIRCLE_COLOR, center, CIRCLE_RADIUS, CIRCLE_WIDTH)
+                assets.play('click')
+                self.game.set_game_data({'game mode': 'pvp', 'ai mode': None, 'ai player': None})
+                return 'game'
 
-    def show_win(self, winner_player, orientation, first_element, last_element):
+            elif clicked is self.computer_button:
 
-        WIN_SOUND.play()
+                assets.play('click')
+                return 'computer'
 
-        if winner_player == 1:
-            color = CROSS_COLOR
-        elif winner_player == 2:
-            color = CIRCLE_COLOR
+            elif event.type == pg.KEYDOWN and event.key == pg.K_h:
 
-        if SHARP_EDGE_WIN:
+                assets.play('click')
+                self.game.set_game_data({'game mode': 'ai', 'ai mode': HARD_AI_MODE, 'ai player': 2})
+                return 'game'
 
-            diagonal_offset = round(OFFSET / mp.sqrt(2))
+            elif event.type == pg.KEYDOWN and event.key == pg.K_e:
 
-            row_first, col_first = first_element
-            row_last, col_last = last_element
+                assets.play('click')
+                self.game.set_game_data({'game mode': 'ai', 'ai mode': 'random', 'ai player': 2})
+                return 'game'
 
-            x_first_center, y_first_center = self.center_of_tile(row_first, col_first)
-            x_last_center, y_last_center = self.center_of_tile(row_last, col_last)
+            elif ((event.type == pg.KEYDOWN and event.key == pg.K_s) or
+                  clicked is self.shortcuts_button):
 
-            if orientation == 'horizontal':
-                line_start = (x_first_center - OFFSET, y_first_center)
-                line_end = (x_last_center + OFFSET, y_last_center)
+                assets.play('click')
+                return 'shortcuts'
 
-            elif orientation == 'vertical':
+            elif ((event.type == pg.QUIT) or (event.type == pg.KEYDOWN and event.key == pg.K_q) or
+                  clicked is self.quit_button):
+                return 'quit'
 
-                line_start = (x_first_center, y_first_center - OFFSET)
-                line_end = (x_last_center, y_last_center + OFFSET)
+        return None
 
-            elif orientation == 'up diagonal':
 
-                line_start = (x_first_center - diagonal_offset, y_first_center + diagonal_offset)
-                line_end = (x_last_center + diagonal_offset, y_last_center - diagonal_offset)
+class ComputerScene(Scene):
 
-            elif orientation == 'down diagonal':
+    def enter(self):
 
-                line_start = (x_first_center - diagonal_offset, y_first_center - diagonal_offset)
-                line_end = (x_last_center + diagonal_offset, y_last_center + diagonal_offset)
+        scale_value = self.game.scale_value
 
-            pg.draw.line(screen, color, line_start, line_end, WIN_WIDTH)
+        self.widgets = WidgetManager()
+        self.hard_mode_button = self.widgets.add(Button('Hard', BUTTON_SIZE, (round(WIDTH / 2), scale_value(375))))
+        self.medium_mode_button = self.widgets.add(Button('Medium', BUTTON_SIZE, (round(WIDTH / 2), scale_value(275))))
+        self.easy_mode_button = self.widgets.add(Button('Easy', BUTTON_SIZE, (round(WIDTH / 2), scale_value(175))))
 
-        if not SHARP_EDGE_WIN:
+        renderer.show_layer('background', lambda surface: surface.fill(BG_COLOR))
 
-            row, col = first_element
-            tile_x, tile_y = self.center_of_tile(row, col)
+    def frame(self, events):
 
-            if orientation in ['up diagonal', 'down diagonal']:
+        self.widgets.update(events)
+        self.draw_widgets()
 
-                length = ((ROWS - 1) * mp.sqrt(2) * TILE_SIZE) + (2 * OFFSET)
-                center = (round(WIDTH / 2), round(HEIGHT / 2))
+        for event in events:
 
-            else:
-                length = (ROWS - 1) * TILE_SIZE + (2 * OFFSET)
+            clicked = self.widgets.clicked(event)
 
-            if orientation == 'horizontal':
-                rotation = 90
-                center = (round(WIDTH / 2), tile_y)
+            if event.type == pg.QUIT:
+                return 'quit'
 
-            elif orientation == 'vertical':
-                rotation = 0
-                center = (tile_x, round(HEIGHT / 2))
+            if clicked is self.hard_mode_button:
 
-            elif orientation == 'up diagonal':
-                rotation = -45
+                assets.play('click')
+                self.game.set_game_data({'game mode': 'ai', 'ai mode': HARD_AI_MODE, 'ai player': 2})
+                return 'game'
 
-            elif orientation == 'down diagonal':
-                rotation = 45
+            if clicked is self.medium_mode_button:
 
-            line_surface = pg.Surface((WIN_WIDTH, length))
-            line_surface.set_colorkey((0, 0, 0))
-            line_surface.fill(color)
+                assets.play('click')
+                self.game.set_game_data({'game mode': 'ai', 'ai mode': 'medium', 'ai player': 2})
+                return 'game'
 
-            line = pg.transform.rotate(line_surface, rotation)
-            rotated_line = line.get_rect(center=center)
-            screen.blit(line, rotated_line.topleft)
+            if clicked is self.easy_mode_button:
 
-    def click_on_line(self, x, y):
+                assets.play('click')
+                self.game.set_game_data({'game mode': 'ai', 'ai mode': 'random', 'ai player': 2})
+                return 'game'
 
-        on_line = False
+        return None
 
-        for i in range(1, COLS):
 
-            line_start = (i * TILE_SIZE) - (LINE_WIDTH // 2)
-            line_end = (i * TILE_SIZE) + (LINE_WIDTH // 2)
+class ShortcutsScene(Scene):
 
-            if line_start <= x <= line_end:
-                on_line = True
+    text = '''
+P : To play multiplayer
+H : To play with Computer - Hard
+E : To play with Computer - Easy
+S : To go to Shortcuts
+Q : To quit
 
-        for j in range(1, ROWS):
+T     : To show a hint
+ENTER : To restart Game 
+M     : To go to Main Menu'''
 
-            line_start = (j * TILE_SIZE) - (LINE_WIDTH // 2)
-            line_end = (j * TILE_SIZE) + (LINE_WIDTH // 2)
+    def enter(self):
 
-            if line_start <= y <= line_end:
-                on_line = True
+        scale_value = self.game.scale_value
 
-        return on_line
+        self.widgets = WidgetManager()
+        self.back_button = self.widgets.add(Button('Back', BUTTON_SIZE, (scale_value(400), scale_value(495))))
 
-    def center_of_tile(self, row, col):
-        line_adjustment = LINE_WIDTH // 2
+        renderer.show_layer('shortcuts', self.draw_text)
 
-        left_x = TILE_SIZE * col
-        right_x = TILE_SIZE * (col + 1)
+    def draw_text(self, surface):
 
-        top_y = TILE_SIZE * row
-        down_y = TILE_SIZE * (row + 1)
+        surface.fill(BG_COLOR)
 
-        if col == 0:
-            right_x -= line_adjustment
+        line_height = 10
 
-        elif col == COLS - 1:
-            left_x += line_adjustment
+        x, y = (self.game.scale_value(30), self.game.scale_value(15))
 
-        else:
-            left_x += line_adjustment
-            right_x -= line_adjustment
+        for line in self.text.split('\n'):
+            text_render = surface_cache.text(line, NORMAL_FONT_COLOR, NORMAL_FONT_NAME, NORMAL_FONT_SIZE)
+            surface.blit(text_render, (x, y))
 
-        if row == 0:
-            down_y -= line_adjustment
+            text_height = text_render.get_height()
+            y += text_height + line_height
 
-        elif row == ROWS - 1:
-            top_y += line_adjustment
+    def frame(self, events):
 
-        else:
-            top_y += line_adjustment
-            down_y -= line_adjustment
+        self.widgets.update(events)
+        self.draw_widgets()
 
-        center_x = round((left_x + right_x) / 2)
-        center_y = round((top_y + down_y) / 2)
+        for event in events:
 
-        return (center_x, center_y)
+            if event.type == pg.QUIT:
+                return 'quit'
 
-    def scale_value(self, value, factor=FACTOR):
+            if self.widgets.clicked(event) is self.back_button:
 
-        return round(value * factor)
+                assets.play('click')
+                return 'menu'
 
+        return None
 
-class Button:
-    all_buttons = []
 
-    def __init__(self, text, size, pos):
+class PlayScene(Scene):
 
-        self.text = text
-        self.pos = pos
-        self.button = pg.Rect(0, 0, size[0], size[1])
-        self.button.center = self.pos
-        self.hover = False
-        self.pressed = False
+    def enter(self):
 
-        Button.add_button(self)
+        self.game.initialize_game()
+        self.ai_worker = AIWorker(self.game.ai) if self.game.game_mode == 'ai' else None
+        self.finish_time = None
 
-    @classmethod
-    def add_button(cls, self):
-        cls.all_buttons.append(self)
+    @property
+    def animating(self):  # the AI and hint workers are polled every frame while they think
+        return self.ai_turn() or self.game.hint_worker is not None
 
-    @classmethod
-    def remove_all_buttons(cls):
-        pg.mouse.set_cursor(pg.cursors.Cursor(pg.SYSTEM_CURSOR_ARROW))
-        cls.all_buttons = []
+    def ai_turn(self):
 
-    @classmethod
-    def change_cursor(cls):
+        game = self.game
+        return game.running and game.game_mode == 'ai' and game.cur_player == game.ai.ai_player
 
-        current_cursor = pg.mouse.get_cursor().data[0]
+    def frame(self, events):
 
-        if any([button.check_hover() for button in cls.all_buttons]):
-            if current_cursor != pg.SYSTEM_CURSOR_HAND:
-                pg.mouse.set_cursor(pg.cursors.Cursor(pg.SYSTEM_CURSOR_HAND))
+        game = self.game
+        ai_turn = self.ai_turn()
 
-        else:
-            pg.mouse.set_cursor(pg.cursors.Cursor(pg.SYSTEM_CURSOR_ARROW))
+        for event in events:
 
-    def check_hover(self):
+            if event.type == pg.QUIT:
+                return 'quit'
 
-        pos = pg.mouse.get_pos()
-        if self.button.collidepoint(pos):
-            return True
+            if event.type == pg.KEYDOWN and event.key == pg.K_m:
 
-        return False
+                assets.play('click')
+                game.set_variables_to_default()
+                return 'menu'
 
-    def check_click(self):
+            if event.type == pg.KEYDOWN and event.key == pg.K_t and not ai_turn and game.running:
+                game.show_hint()
 
-        pos = pg.mouse.get_pos()
-        if self.button.collidepoint(pos):
-            return True
+            if event.type == pg.MOUSEBUTTONDOWN and not ai_turn and game.running:
 
-        return False
+                tile = game.tile_at(*event.pos)
 
-    def blit(self, font_info, box_color, border=None, hover=None):
+                if tile is not None and game.board.check_empty(*tile):
+                    game.make_move(*tile)
+                    self.check_game_over()
 
-        font_name, font_size, font_color, bold, italic = font_info
+        game.poll_hint()
 
-        hovering = self.check_hover()
+        if ai_turn:
 
-        Button.change_cursor()
+            if not self.ai_worker.thinking():
+                self.ai_worker.start()
 
-        if hover and hovering:
-            color, font_color = hover
+            move = self.ai_worker.poll()
 
-        else:
-            color = box_color
+            if move is None:
+                game.show_thinking(self.ai_worker.thinking_time())
 
-        if border:
-            border_width, border_color = border
+            else:
+                game.show_thinking(None)
+                recorder.add_ai_time(self.ai_worker.thinking_time())
 
-            border_width_scale = 1 - border_width / self.button.width
-            border_height_scale = 1 - border_width / self.button.height
+                game.make_move(*move)
+                self.check_game_over()
+
+        # the finished board stays up for a moment before the end screen
+        if not game.running and time.perf_counter() - self.finish_time >= END_SCREEN_DELAY:
+            return 'end'
+
+        return None
+
+    def resize(self):
+        self.game.draw_board()  # the game goes on at the new scale
+
+    def check_game_over(self):
+
+        if self.game.game_over():
+            self.game.running = False
+            self.finish_time = time.perf_counter()
+
+            recorder.finish(self.game.final_state)
+
+    def exit(self):
+
+        recorder.finish(UNFINISHED)  # nothing to do if the game already ended
+        self.game.cancel_hint()
+
+        if self.ai_worker is not None:
+            self.ai_worker.shutdown()
+            self.ai_worker = None
+
+            self.game.show_thinking(None)
+
+
+class EndScene(Scene):
+
+    def enter(self):
 
-            pg.draw.rect(screen, border_color, self.button, 0, BUTTON_RADIUS)
-            self.border = self.button.scale_by(border_width_scale, border_height_scale)
-            pg.draw.rect(screen, color, self.border, 0, BUTTON_RADIUS)
+        self.fade_frame = 0
+        self.layout()
+
+    def layout(self):
+
+        game = self.game
+
+        # Surfaces : the finished board is kept and faded towards the background under the overlay
+        self.finished_board = screen.copy()
+
+        self.overlay = pg.Surface(screen.get_size()).convert()
+        self.overlay.fill(BG_COLOR)
+
+        # Header
+        header_font_size = HEADER_FONT_SIZE
+
+        if game.final_state == 0:
+            header_text = 'DRAW'
+
+        elif game.game_mode == 'pvp':
+            header_text = 'X WON' if game.final_state == 1 else 'O WON'
+
+        elif game.final_state == game.ai.ai_player:
+            header_text = 'COMPUTER WON'
+            header_font_size = game.scale_value(50)
 
         else:
-            pg.draw.rect(screen, color, self.button, 0, BUTTON_RADIUS)
+            header_text = 'YOU WON'
 
-        font = pg.font.SysFont(font_name, font_size, bold=bold, italic=italic)
-        text_render = font.render(self.text, 1, font_color)
-        text_rect = text_render.get_rect(center=self.pos)
+        header_pos = (round(WIDTH / 2), game.scale_value(100))
+        self.header_render = surface_cache.text(header_text, HEADER_FONT_COLOR, HEADER_FONT_NAME, header_font_size,
+                                                bold=True)
+        self.header_position = self.header_render.get_rect(center=header_pos).topleft
 
-        screen.blit(text_render, text_rect.topleft)
+        # Buttons
+        self.widgets = WidgetManager()
 
-    def __repr__(self):
-        return f'{self.text} Button'
+        restart_button_pos = (round(WIDTH / 2), game.scale_value(220))
+        self.restart_button = self.widgets.add(Button('Restart', BUTTON_SIZE, restart_button_pos))
 
+        main_menu_button_pos = (round(WIDTH / 2), game.scale_value(320))
+        self.main_menu_button = self.widgets.add(Button('Menu', BUTTON_SIZE, main_menu_button_pos))
 
-def main(restart=False):
-    game = Game()
+    @property
+    def animating(self):
+        return self.fade_frame < END_FADE_FRAMES
 
-    if not restart:
-        game.start_screen()
+    def frame(self, events):
 
-    game.initialize_game()
-    board = game.board
+        self.widgets.update(events)
 
-    if game.game_mode == 'ai':
-        ai = game.ai
+        # Displaying
+        if self.fade_frame < END_FADE_FRAMES:
+            self.fade_frame += 1
+            self.draw_fade()
 
-    while True and game.running:
+        self.draw_widgets()
 
-        clock.tick(FPS)
+        for event in events:
 
-        for event in pg.event.get():
+            clicked = self.widgets.clicked(event)
 
             if event.type == pg.QUIT:
-                pg.quit()
-                sys.exit()
-                break
+                return 'quit'
+
+            if ((event.type == pg.KEYDOWN and event.key == pg.K_m) or
+                    clicked is self.main_menu_button):
+
+                assets.play('click')
+                self.game.set_variables_to_default()
+                return 'menu'
+
+            if ((event.type == pg.KEYDOWN and event.key == pg.K_RETURN) or
+                    clicked is self.restart_button):
+
+                assets.play('click')
+
+                if self.game.game_mode == 'ai':
+                    self.game.change_ai_player()
+
+                return 'game'
+
+        return None
+
+    def draw_fade(self):
+
+        # same result as blending the background in at alpha 20 once per frame
+        self.overlay.set_alpha(round(255 * (1 - (1 - 20 / 255) ** self.fade_frame)))
+
+        screen.blit(self.finished_board, (0, 0))
+        screen.blit(self.overlay, (0, 0))
+        screen.blit(self.header_render, self.header_position)
+        renderer.mark_all_dirty()
+
+        self.widgets.invalidate()
+
+    def resize(self):
+
+        # the finished board is drawn again at the new scale and the fade goes on from where it was
+        self.widgets.close()
+        self.game.draw_board()
+
+        self.layout()
+        self.draw_fade()
+
+    def exit(self):
+
+        super().exit()
+        self.finished_board = self.overlay = None
+
+
+class SceneManager:
+    # one top-level loop runs the current scene, so menus and restarts never stack frames or keep old games alive
+
+    def __init__(self):
+
+        self.game = Game()
+        self.scenes = {
+            'menu': MenuScene(self.game),
+            'computer': ComputerScene(self.game),
+            'shortcuts': ShortcutsScene(self.game),
+            'game': PlayScene(self.game),
+            'end': EndScene(self.game),
+        }
+
+        self.name = None
+        self.scene = None
+
+    def switch(self, name):
+
+        hud.erase()  # the next scene may copy the screen
+
+        if self.scene is not None:
+            self.scene.exit()
+
+        if name == 'quit':
+            quit_game()
+
+        self.name = name
+        self.scene = self.scenes[name]
+        self.scene.enter()
+
+    def resize(self, size):
+
+        if size == (WIDTH, HEIGHT):  # also the event for the window being made square again
+            return
+
+        set_scale(scale_for_window(size))
+        self.scene.resize()
+
+    def step(self, events):
+
+        frame_start = time.perf_counter()
+        hud.erase()
+
+        resizes = [event for event in events if event.type == pg.VIDEORESIZE]
 
-            if event.type == pg.MOUSEBUTTONDOWN:
+        if resizes:
+            self.resize(resizes[-1].size)  # a drag sends many sizes, only the last one is drawn
 
-                x, y = event.pos
+        for event in events:
+            if event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                hud.toggle()
 
-                if not game.click_on_line(x, y):
+        with profiler.span(f'{self.name} frame', 'frame', events=len(events)):
+            next_scene = self.scene.frame(events)
 
-                    row = y // TILE_SIZE
-                    col = x // TILE_SIZE
+        hud.draw()
+        renderer.update()
+        hud.frame_done(frame_start, events)
 
-                    if board.check_empty(row, col) and game.running:
-                        game.make_move(row, col)
+        if not assets.icon_shown:
+            assets.show_icon()
 
-                        if game.game_over():
-                            game.running = False
+        if next_scene is not None:
+            self.switch(next_scene)
 
-        pg.display.update()
+    def start(self, first='menu'):
 
-        if game.game_mode == 'ai' and game.cur_player == ai.ai_player and game.running:
+        # the first frame goes up before anything it doesn't need is loaded
+        self.switch(first)
+        self.step([])
 
-            row, col = ai.ai_move()
+        assets.start_loading()
 
-            game.make_move(row, col)
+    def run(self, first='menu'):
 
-            if game.game_over():
-                game.running = False
+        self.start(first)
 
-            pg.display.update()
+        while True:
+            self.step(idle_clock.tick(animating=self.scene.animating))
 
-    pg.time.wait(2000)
-    game.end_screen()
 
-    if not restart:
-        game.set_variables_to_default()
+def main():
+    SceneManager().run()
 
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
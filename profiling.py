@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from constants import *
+
+# Timers for the game loop and the AI. Spans cost one attribute check while the profiler is off, when it is on
+# they are kept as Chrome trace events (chrome://tracing, ui.perfetto.dev) and the latest of each is kept for the HUD
+
+
+class Span:
+
+    def __init__(self, profiler, name, category, args):
+
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def set(self, **args):  # details only known once the timed work is done
+        self.args.update(args)
+
+    def __enter__(self):
+
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.category, self.start, time.perf_counter(), self.args)
+
+
+class NullSpan:
+    # what span() hands out while profiling is off, shared so nothing is allocated
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+
+    def __init__(self, max_events):
+
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=max_events)  # the oldest events go first in a very long session
+        self.latest = {}  # name : (seconds, args) of the last span with that name
+
+    def span(self, name, category='game', **args):
+
+        if not self.enabled:
+            return NULL_SPAN
+
+        return Span(self, name, category, args)
+
+    def record(self, name, category, start, end, args):
+
+        # complete events, timestamps in microseconds since the profiler was made
+        self.events.append({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        })
+
+        self.latest[name] = (end - start, args)
+
+    def export(self, path):
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+
+
+profiler = Profiler(PROFILE_MAX_EVENTS)
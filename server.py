@@ -0,0 +1,203 @@
+"""
+Hosts games over TCP for many clients at once, one game per connection, with the engines of tournament.py.
+
+    python server.py
+    python server.py --port 6000 --workers 4
+
+Every request is one line and gets one line back, OK and the game state or ERR and the reason:
+
+    NEW [ENGINE]    starts a new game, ENGINE as in tournament.py, HARD_AI_MODE by default
+    MOVE ROW COL    plays a move for the player to move
+    AI              the engine plays for the player to move, the reply ends with "move ROW COL"
+    STATE           the game state
+    QUIT            closes the connection
+
+A state is the board as one digit per square, row by row (0 empty, 1 or 2 the player's mark), then
+"turn PLAYER", "won PLAYER" or "draw":
+
+    MOVE 1 1  ->  OK 000010000 turn 2
+    AI        ->  OK 200010000 turn 1 move 0 0
+
+Searches run in a process pool, so the event loop keeps answering every other connection while an AI thinks.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from constants import *
+from engine import AI, board_from_position, new_board
+from tournament import make_ai
+
+
+def search_move(spec, position, ai_player):
+
+    # runs in a pool worker, whose transposition and solved tables stay loaded between requests
+    return make_ai(spec, board_from_position(position), ai_player).ai_move()
+
+
+class Session:
+    # the game of one connection
+
+    def __init__(self):
+
+        self.board = None  # None until the first NEW
+        self.spec = None
+        self.cur_player = 1
+
+    def new_game(self, spec):
+
+        make_ai(spec, new_board(), 1)  # an unknown engine raises ValueError before the old game is replaced
+
+        self.board = new_board()
+        self.spec = spec
+        self.cur_player = 1
+
+    def game_over(self):
+        return self.board.state() != 0 or self.board.isfull()
+
+    def play(self, row, col):
+
+        self.board.mark_move(row, col, self.cur_player)
+        self.cur_player = 3 - self.cur_player
+
+    def state(self):
+
+        position = ''.join(map(str, self.board.position()))
+        winner = self.board.state()
+
+        if winner != 0:
+            return f'{position} won {winner}'
+
+        elif self.board.isfull():
+            return f'{position} draw'
+
+        return f'{position} turn {self.cur_player}'
+
+
+class GameServer:
+
+    def __init__(self, workers):
+
+        self.workers = workers
+        self.pool = None  # started by run
+
+    async def reply(self, session, words):
+
+        command, args = words[0].upper(), words[1:]
+
+        if command == 'NEW':
+
+            try:
+                session.new_game(args[0] if args else HARD_AI_MODE)
+            except ValueError as error:
+                return f'ERR {error}'
+
+            return f'OK {session.state()}'
+
+        if command not in ('MOVE', 'AI', 'STATE'):
+            return f'ERR unknown command {command}'
+
+        if session.board is None:
+            return 'ERR no game, send NEW first'
+
+        if command == 'STATE':
+            return f'OK {session.state()}'
+
+        if session.game_over():
+            return 'ERR the game is over'
+
+        if command == 'MOVE':
+
+            try:
+                row, col = map(int, args)
+            except ValueError:
+                return 'ERR MOVE needs ROW COL'
+
+            if not (0 <= row < ROWS and 0 <= col < COLS and session.board.check_empty(row, col)):
+                return f'ERR {row} {col} is not an empty square'
+
+            session.play(row, col)
+            return f'OK {session.state()}'
+
+        ai = make_ai(session.spec, session.board, session.cur_player)
+
+        # a random move or a solved table lookup costs less than the trip to a worker
+        if ai.mode == 'random' or (ai.mode == 'minimax' and ai.use_solved_table and AI.get_solved_table()):
+            row, col = ai.ai_move()
+
+        else:
+            row, col = await asyncio.get_running_loop().run_in_executor(
+                self.pool, search_move, session.spec, session.board.position(), session.cur_player)
+
+        session.play(row, col)
+        return f'OK {session.state()} move {row} {col}'
+
+    async def serve_client(self, reader, writer):
+
+        session = Session()
+
+        try:
+            while True:
+
+                # requests of one connection are answered in order, so a game never changes under its own search
+                line = await reader.readline()
+
+                if not line:  # the client closed the connection
+                    break
+
+                words = line.decode(errors='replace').split()
+
+                if not words:
+                    continue
+
+                if words[0].upper() == 'QUIT':
+                    break
+
+                writer.write((await self.reply(session, words)).encode() + b'\n')
+                await writer.drain()
+
+        except (ConnectionError, ValueError):  # ValueError for a line longer than the stream's limit
+            pass
+
+        except asyncio.CancelledError:
+            pass  # the server is shutting down with the connection still open
+
+        finally:
+            writer.close()
+
+    async def run(self, host, port):
+
+        # spawned rather than forked workers don't inherit the listening socket, which would keep the port taken
+        with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+
+            self.pool = pool
+            server = await asyncio.start_server(self.serve_client, host, port, backlog=4096)
+
+            print(f'Listening on {host}:{port} with {self.workers} search workers')
+
+            async with server:
+                await server.serve_forever()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Host games for many clients over a line based TCP protocol.')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS or os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # terminating shuts the workers down like Ctrl+C
+
+    try:
+        asyncio.run(GameServer(args.workers).run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+SETTINGS_VERSION = 1
+DEFAULT_SETTINGS = {'game mode': 'pvp', 'ai mode': None, 'ai player': None}
+
+
+class SettingsStore:
+    # the current settings live in memory, a background thread writes them out with an atomic rename
+
+    def __init__(self, path):
+
+        self.path = path
+        self.data = self.load()
+
+        self.lock = threading.Lock()        # guards data and pending
+        self.write_lock = threading.Lock()  # one writer at a time, so an older snapshot never lands last
+        self.pending = False
+        self.changed = threading.Event()
+        self.writer = None
+
+    def load(self):
+
+        # read once at startup, anything missing, unreadable or from another version falls back to the defaults
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+
+        except (OSError, ValueError):
+            return dict(DEFAULT_SETTINGS)
+
+        if not isinstance(stored, dict) or stored.get('version') != SETTINGS_VERSION:
+            return dict(DEFAULT_SETTINGS)
+
+        return {key: stored.get(key, value) for key, value in DEFAULT_SETTINGS.items()}
+
+    def get(self):
+
+        with self.lock:
+            return dict(self.data)
+
+    def update(self, data):
+
+        with self.lock:
+            self.data = {**self.data, **data}
+            self.pending = True
+
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, name='settings writer', daemon=True)
+            self.writer.start()
+
+        self.changed.set()
+
+    def write_loop(self):
+
+        while True:
+            self.changed.wait()
+            self.changed.clear()
+            self.flush()
+
+    def flush(self):
+
+        with self.write_lock:
+
+            with self.lock:
+                if not self.pending:
+                    return
+
+                snapshot = {'version': SETTINGS_VERSION, **self.data}
+                self.pending = False
+
+            temporary_path = self.path + '.tmp'
+
+            try:
+                with open(temporary_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                os.replace(temporary_path, self.path)
+
+            except OSError:
+                # keep playing with the settings in memory, the next change tries again
+                with self.lock:
+                    self.pending = True
@@ -0,0 +1,161 @@
+"""
+Plays thousands of games through the scene manager without a window and checks that memory stays flat.
+
+    python soak_test.py --games 5000
+
+Every game goes through the menu, now and then the shortcuts screen, and ends with a restart or a return to the
+menu, so every scene switch is exercised. Exits with status 1 when memory grows more than --tolerance KB between
+the first and last checkpoint, or when old games, boards, AIs or worker threads are kept alive.
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import main as tic_tac_toe
+import pygame as pg
+from engine import AI, AIWorker
+
+# nothing here for a person to look at, so the finished board goes straight to the end screen
+tic_tac_toe.END_SCREEN_DELAY = 0
+tic_tac_toe.recorder.enabled = False  # thousands of made up games don't belong in the game's records
+
+# nor do their settings belong in the player's settings file, the directory goes away when the test exits
+settings_dir = tempfile.TemporaryDirectory()
+tic_tac_toe.settings.path = os.path.join(settings_dir.name, tic_tac_toe.DATA_FILE)
+
+
+def key(key_code):
+    return pg.event.Event(pg.KEYDOWN, key=key_code, mod=0, unicode='', scancode=0)
+
+
+def click(pos):
+    return pg.event.Event(pg.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+
+# at most the current game's objects may be alive on the menu
+LIVE_OBJECT_LIMITS = {'Game': 1, 'Board': 1, 'AI': 1, 'AIWorker': 0}
+
+
+def live_objects():
+
+    gc.collect()
+    counts = {'Game': 0, 'Board': 0, 'AI': 0, 'AIWorker': 0}
+
+    for obj in gc.get_objects():
+        if isinstance(obj, tic_tac_toe.Game):
+            counts['Game'] += 1
+        elif isinstance(obj, AI):
+            counts['AI'] += 1
+        elif isinstance(obj, AIWorker):
+            counts['AIWorker'] += 1
+        elif type(obj).__name__ in ('Board', 'BitBoard'):
+            counts['Board'] += 1
+
+    counts['threads'] = threading.active_count()
+    return counts
+
+
+def play_game(manager, rng):
+
+    # from the menu to the end screen, clicking random empty squares on the human turns
+    game = manager.game
+
+    while manager.name == 'game':
+
+        ai_turn = game.game_mode == 'ai' and game.cur_player == game.ai.ai_player
+
+        if ai_turn:
+            manager.step([])
+            time.sleep(0.0005)  # the AI worker thread needs a moment
+
+        else:
+            row, col = rng.choice(game.board.get_empty_squares())
+            manager.step([click(tic_tac_toe.get_atlas().center_of_tile(row, col))])
+
+
+def start_game(manager, rng):
+
+    if rng.random() < 0.1:
+        manager.step([key(pg.K_s)])
+        manager.step([click(manager.scene.back_button.button.center)])
+
+    manager.step([key(rng.choice((pg.K_p, pg.K_h, pg.K_e)))])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Play many games through the scenes and watch memory.')
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--checkpoints', type=int, default=10)
+    parser.add_argument('--tolerance', type=float, default=64, help='allowed growth in KB')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    manager = tic_tac_toe.SceneManager()
+    manager.switch('menu')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    checkpoint_every = max(1, args.games // args.checkpoints)
+    memory = []
+    objects = []
+
+    for game_number in range(1, args.games + 1):
+
+        if manager.name == 'menu':
+            start_game(manager, rng)
+
+        play_game(manager, rng)
+
+        # the end screen either restarts or goes back to the menu, checkpoints are always taken on the menu
+        checkpoint = game_number % checkpoint_every == 0
+        manager.step([key(pg.K_m if checkpoint or rng.random() < 0.5 else pg.K_RETURN)])
+
+        if checkpoint:
+
+            objects.append(live_objects())
+            memory.append(tracemalloc.get_traced_memory()[0] / 1024)
+
+            print(f'{game_number:>7} games  {memory[-1]:10.1f} KB  {objects[-1]}')
+
+    elapsed = time.perf_counter() - start
+    print(f'{args.games} games in {elapsed:.1f}s ({args.games / elapsed:.0f} games/s)')
+
+    # the first checkpoint already has every cache warm, growth after it is a leak
+    growth = memory[-1] - memory[0]
+    failures = []
+
+    if growth > args.tolerance:
+        failures.append(f'memory grew {growth:.1f} KB between the first and last checkpoint')
+
+    for name, limit in LIVE_OBJECT_LIMITS.items():
+
+        most = max(counts[name] for counts in objects)
+        if most > limit:
+            failures.append(f'{most} {name} objects alive on the menu, at most {limit} expected')
+
+    if objects[-1]['threads'] != objects[0]['threads']:
+        failures.append(f'threads went from {objects[0]["threads"]} to {objects[-1]["threads"]}')
+
+    if failures:
+        print('\n'.join(failures))
+        return 1
+
+    print(f'Memory grew {growth:+.1f} KB over {args.games} games, no old games kept alive')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Starts the game in fresh processes and reports how long the window takes to show its first frame.
+
+    python startup_benchmark.py --runs 10
+    python startup_benchmark.py --headless      without a display or audio device, e.g. on CI
+
+Every run is timed from launching the interpreter to:
+    imports and window    main imported, the window is open
+    first frame           the menu is on the screen
+    assets loaded         the icon and sounds are ready on the asset thread, after the first frame
+The first run pays for cold disk caches, so it is shown apart from the median of all runs.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from engine import base_dir
+
+# runs in the child process, times are wall clock so they compare with the parent's
+CHILD = '''
+import json, time
+import main
+imported = time.time()
+
+manager = main.SceneManager()
+manager.start()
+first_frame = time.time()
+
+main.assets.loaded.wait()
+print(json.dumps({'imports and window': imported, 'first frame': first_frame, 'assets loaded': time.time()}))
+'''
+
+
+def time_startup(env):
+
+    start = time.time()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=base_dir, env=env, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        raise RuntimeError(f'the game failed to start:\n{result.stderr}')
+
+    times = json.loads(result.stdout.splitlines()[-1])
+    return {name: (moment - start) * 1000 for name, moment in times.items()}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Measure the time to the first frame of fresh game processes.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--headless', action='store_true', help='use SDL dummy video and audio drivers')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.headless:
+        env.update(SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy')
+
+    runs = [time_startup(env) for _ in range(args.runs)]
+
+    print(f'{"ms after launch":>20}  {"first run":>10}  {"median":>10}  {"max":>10}')
+
+    for name in runs[0]:
+        times = [run[name] for run in runs]
+        print(f'{name:>20}  {times[0]:10.1f}  {statistics.median(times):10.1f}  {max(times):10.1f}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
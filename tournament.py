@@ -0,0 +1,203 @@
+"""
+Plays AI modes against each other on every CPU core.
+
+An engine is given as MODE[:OPTION]:
+    random
+    medium              best moves, with MEDIUM_MISTAKE_CHANCE of a next best one
+    minimax             solved table when available, search otherwise
+    minimax:search      always searches
+    alphabeta:DEPTH     depth limited alpha-beta
+    iterative:MS        iterative deepening alpha-beta with MS milliseconds per move
+    mcts[:ROLLOUTS]     Monte Carlo tree search, ROLLOUTS per move or AI_TIME_BUDGET by default
+
+Example:
+    python tournament.py minimax alphabeta:4 --games 1000 --output results.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+from engine import AI, new_board
+
+
+def make_ai(spec, board, ai_player):
+
+    mode, _, option = spec.partition(':')
+
+    valid_option = (not option or (mode == 'minimax' and option == 'search') or
+                    (mode in ('alphabeta', 'iterative', 'mcts') and option.isdigit()))
+
+    if mode not in ('random', 'medium', 'minimax', 'alphabeta', 'iterative', 'mcts') or not valid_option:
+        raise ValueError(f'Unknown engine {spec!r}')
+
+    ai = AI(board, mode, ai_player)
+
+    if mode == 'alphabeta' and option:
+        ai.depth_limit = int(option)
+
+    elif mode == 'iterative' and option:
+        ai.time_budget = int(option)
+
+    elif mode == 'mcts':
+        ai.mcts_workers = 1  # the games already run on every core, and pool workers can't start their own pool
+
+        if option:
+            ai.mcts_iterations = int(option)
+
+    elif mode == 'minimax' and option == 'search':
+        ai.use_solved_table = False
+
+    return ai
+
+
+def play_game(task):
+
+    game_number, player_1_spec, player_2_spec, seed = task
+    random.seed(seed)
+
+    board = new_board()
+    ais = {1: make_ai(player_1_spec, board, 1), 2: make_ai(player_2_spec, board, 2)}
+
+    moves = []
+    move_times = {1: [], 2: []}  # milliseconds
+    nodes = {1: 0, 2: 0}
+    depths = {1: [], 2: []}  # depth reached on each move, 'iterative' only
+
+    player = 1
+    while board.state() == 0 and not board.isfull():
+
+        start = time.perf_counter()
+        row, col = ais[player].ai_move()
+        move_times[player].append((time.perf_counter() - start) * 1000)
+
+        nodes[player] += ais[player].nodes
+
+        if ais[player].mode == 'iterative':
+            depths[player].append(ais[player].depth_reached)
+        board.mark_move(row, col, player)
+        moves.append((row, col))
+
+        player = 2 if player == 1 else 1
+
+    return {
+        'game': game_number,
+        'player 1': player_1_spec,
+        'player 2': player_2_spec,
+        'winner': board.state(),
+        'moves': moves,
+        'move times': move_times,
+        'nodes': nodes,
+        'depths': depths,
+    }
+
+
+def percentile(values, percent):
+
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+
+    return values[index]
+
+
+def summarise(records, engine_a, engine_b):
+
+    stats = {engine: {'wins': 0, 'draws': 0, 'losses': 0, 'times': [], 'nodes': 0, 'moves': 0, 'depths': []}
+             for engine in (engine_a, engine_b)}
+
+    for record in records:
+        for player, other in ((1, 2), (2, 1)):
+
+            engine = record[f'player {player}']
+            engine_stats = stats[engine]
+
+            if engine_a == engine_b and player == 2:
+                continue  # a mirror match would count every game twice
+
+            if record['winner'] == player:
+                engine_stats['wins'] += 1
+            elif record['winner'] == other:
+                engine_stats['losses'] += 1
+            else:
+                engine_stats['draws'] += 1
+
+            engine_stats['times'] += record['move times'][player]
+            engine_stats['nodes'] += record['nodes'][player]
+            engine_stats['moves'] += len(record['move times'][player])
+            engine_stats['depths'] += record['depths'][player]
+
+    games = len(records)
+    lines = [f'{games} games']
+
+    for engine, engine_stats in stats.items():
+
+        times = engine_stats['times']
+        moves = max(1, engine_stats['moves'])
+        depths = engine_stats['depths']
+
+        lines.append(
+            f'{engine:>16}  '
+            f'win {engine_stats["wins"] / games:6.1%}  '
+            f'draw {engine_stats["draws"] / games:6.1%}  '
+            f'loss {engine_stats["losses"] / games:6.1%}  |  '
+            f'move ms p50 {percentile(times, 50):.3f}  p90 {percentile(times, 90):.3f}  '
+            f'p99 {percentile(times, 99):.3f}  max {max(times, default=0):.3f}  |  '
+            f'nodes {engine_stats["nodes"]} ({engine_stats["nodes"] / moves:.1f}/move)'
+        )
+
+        if depths:
+            lines[-1] += f'  |  depth mean {sum(depths) / len(depths):.1f}  min {min(depths)}  max {max(depths)}'
+
+    return '\n'.join(lines)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Play AI modes against each other.')
+    parser.add_argument('engine_a', help='MODE[:OPTION], e.g. minimax or alphabeta:4')
+    parser.add_argument('engine_b', help='MODE[:OPTION]')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-swap', action='store_true', help='engine A is always player 1')
+    parser.add_argument('--output', default='tournament.jsonl', help='one JSON line per finished game')
+    args = parser.parse_args()
+
+    for spec in (args.engine_a, args.engine_b):
+        try:
+            make_ai(spec, new_board(), 1)
+        except ValueError as error:
+            parser.error(str(error))
+
+    tasks = []
+    for game_number in range(args.games):
+
+        # by default engine A takes player 1 in even games and player 2 in odd ones
+        if args.no_swap or game_number % 2 == 0:
+            tasks.append((game_number, args.engine_a, args.engine_b, args.seed + game_number))
+        else:
+            tasks.append((game_number, args.engine_b, args.engine_a, args.seed + game_number))
+
+    records = []
+    start = time.perf_counter()
+
+    with Pool(args.workers) as pool, open(args.output, 'w') as f:
+        for record in pool.imap_unordered(play_game, tasks, chunksize=max(1, args.games // (args.workers * 16))):
+
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+
+            records.append(record)
+
+    print(summarise(records, args.engine_a, args.engine_b))
+    print(f'{time.perf_counter() - start:.2f}s on {args.workers} workers, results in {args.output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())